@@ -0,0 +1,154 @@
+import math
+import os
+
+import numpy as np
+
+import nxml
+from SpritesheetCore import Sheet, extract_frame, parse_animations, parse_xml, content_hash
+
+# --- Constants ---
+ATLAS_PADDING = 1  # Transparent gutter between packed strips so filtering never bleeds
+ATLAS_WIDTH_SCALES = (1.0, 1.1, 1.25, 1.5, 2.0)  # Shelf widths tried, relative to sqrt(total area)
+ATLAS_SUFFIX = "_packed"
+
+# --- Trimming ---
+# A RectAnimation is a strip of equal frames, so trimming works on the union of an
+# animation's opaque pixels: every frame loses the same border and keeps one offset.
+def animation_stack(sheet, anim):
+    return np.stack([extract_frame(sheet, anim, i) for i in range(anim.frame_count)])
+
+def trim_bounds(stack):
+    # (x, y, w, h) of the opaque union over all frames; an empty animation keeps one pixel
+    mask = (stack != 0).any(axis=0)
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    if xs.size == 0:
+        return 0, 0, 1, 1
+    return int(xs[0]), int(ys[0]), int(xs[-1] - xs[0] + 1), int(ys[-1] - ys[0] + 1)
+
+# --- Packing ---
+def pack_rects(sizes, padding=ATLAS_PADDING):
+    # Shelf packing, tallest first, over a few candidate widths; keeps the smallest sheet.
+    # Returns ([(x, y)] in input order, width, height).
+    if not sizes:
+        return [], 0, 0
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    widest = max(w for w, _ in sizes)
+
+    best = None
+    for scale in ATLAS_WIDTH_SCALES:
+        limit = max(widest, int(math.sqrt(area) * scale))
+        positions = [None] * len(sizes)
+        x = y = shelf = width = 0
+        for i in order:
+            w, h = sizes[i]
+            if x and x + w > limit:
+                y += shelf + padding
+                x = shelf = 0
+            positions[i] = (x, y)
+            x += w + padding
+            shelf = max(shelf, h)
+            width = max(width, x - padding)
+        height = y + shelf
+        if best is None or (width * height, max(width, height)) < (best[1] * best[2], max(best[1], best[2])):
+            best = (positions, width, height)
+    return best
+
+# --- Repacking ---
+class Placement:
+    def __init__(self, anim, x, y, trim, shared=False):
+        self.anim = anim
+        self.x = x
+        self.y = y
+        self.trim = trim  # (x, y, w, h) kept from every frame
+        self.shared = shared  # Reuses the strip of an identical animation placed earlier
+
+def plan_atlas(sheet, animations, padding=ATLAS_PADDING):
+    # Animations whose trimmed strips are identical are packed once and share the pixels
+    trims, keys = [], []
+    for anim in animations:
+        stack = animation_stack(sheet, anim)
+        trim = trim_bounds(stack)
+        tx, ty, tw, th = trim
+        trims.append(trim)
+        keys.append(content_hash(repr(stack.shape).encode() + stack[:, ty:ty + th, tx:tx + tw].tobytes()))
+
+    first = {}
+    unique = []
+    for i, key in enumerate(keys):
+        if key not in first:
+            first[key] = len(unique)
+            unique.append(i)
+    sizes = [(trims[i][2] * animations[i].frame_count, trims[i][3]) for i in unique]
+    positions, width, height = pack_rects(sizes, padding)
+
+    placements = []
+    for i, (anim, trim, key) in enumerate(zip(animations, trims, keys)):
+        slot = first[key]
+        x, y = positions[slot]
+        placements.append(Placement(anim, x, y, trim, shared=unique[slot] != i))
+    return placements, width, height
+
+def apply_atlas(sheet, placements, width, height):
+    # Copies every trimmed frame into a fresh sheet; works for any plane aligned with the layout
+    indices = np.zeros((height, width), dtype=sheet.indices.dtype)
+    for placement in placements:
+        if placement.shared:
+            continue
+        anim = placement.anim
+        tx, ty, tw, th = placement.trim
+        stack = animation_stack(sheet, anim)[:, ty:ty + th, tx:tx + tw]
+        strip = stack.transpose(1, 0, 2).reshape(th, tw * anim.frame_count)
+        indices[placement.y:placement.y + th, placement.x:placement.x + strip.shape[1]] = strip
+    return Sheet(indices, sheet.palette.copy())
+
+def number(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+def repacked_xml(sprite, placements, png_name, hotspots_name=None):
+    # Rewrites pos, size and offsets of the packed RectAnimations; child animations keep
+    # pointing at their parents, and everything else is left as it was
+    by_name = {placement.anim.name: placement for placement in placements}
+    sprite_offset = (float(sprite.get("offset_x", 0)), float(sprite.get("offset_y", 0)))
+    for child in sprite.each_of("RectAnimation"):
+        attr = child.attr
+        placement = by_name.get(attr.get("name"))
+        if placement is None or "parent" in attr or "state" in attr:
+            continue
+        tx, ty, tw, th = placement.trim
+        if "offset_x" in attr or "offset_y" in attr:
+            offset = (float(attr.get("offset_x", 0)), float(attr.get("offset_y", 0)))
+        else:
+            offset = sprite_offset
+        attr["pos_x"] = str(placement.x)
+        attr["pos_y"] = str(placement.y)
+        attr["frame_width"] = str(tw)
+        attr["frame_height"] = str(th)
+        # Every strip is one row; written on each animation so none inherits the default's wrap
+        attr["frames_per_row"] = str(placement.anim.frame_count)
+        attr["has_offset"] = "1"
+        attr["offset_x"] = number(offset[0] - tx)
+        attr["offset_y"] = number(offset[1] - ty)
+
+    for key, name in (("filename", png_name), ("hotspots_filename", hotspots_name)):
+        value = sprite.get(key)
+        if value and name:
+            sprite.attr[key] = value.replace('\\', '/').rsplit('/', 1)[0] + '/' + name if '/' in value else name
+    return nxml.tostring(sprite)
+
+def repack(sheet, xml_data, hotspots=None, padding=ATLAS_PADDING):
+    # Returns (packed sheet, packed hotspots or None, sprite element, placements);
+    # the caller names and writes the files
+    sprite = parse_xml(xml_data)
+    # Inherited animations follow their parent's rect, so only animations with their own rows are
+    # placed; animations without frames have nothing to pack and keep their attributes
+    animations = [anim for anim in parse_animations(sprite) if anim.parent is None and anim.frame_count > 0]
+    placements, width, height = plan_atlas(sheet, animations, padding)
+    packed = apply_atlas(sheet, placements, width, height)
+    packed_hotspots = apply_atlas(hotspots, placements, width, height) if hotspots is not None else None
+    return packed, packed_hotspots, sprite, placements
+
+def packed_name(path):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return stem + ATLAS_SUFFIX + ext
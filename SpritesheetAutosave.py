@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+from PIL import Image
+
+from SpritesheetCore import Animation, Sheet, save_animations, save_sheet
+
+# --- Constants ---
+AUTOSAVE_DELAY = 0.5      # Seconds without a new request before the pending writes go out
+FAST_COMPRESS_LEVEL = 1   # While editing: large files, quick writes
+FULL_COMPRESS_LEVEL = 9   # Explicit saves and the pass on exit
+
+# --- Autosaver ---
+class Autosaver:
+    # Write-behind saving. Requests snapshot the sheet on the caller's thread and replace
+    # any pending write of the same file; a background thread writes them once requests
+    # have been quiet for `delay` seconds.
+    def __init__(self, delay=AUTOSAVE_DELAY):
+        self.delay = delay
+        self.pending = {}        # path -> (writer method, arguments after the path)
+        self.fast_paths = set()  # Written with FAST_COMPRESS_LEVEL and not recompressed since
+        self.last_request = 0.0
+        self.writing = False
+        self.urgent = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="Autosaver", daemon=True)
+        self.thread.start()
+
+    def request(self, sheet, path, paletted=False, final=False):
+        snapshot = Sheet(sheet.indices.copy(), sheet.palette.copy())
+        sheet.unsaved = None
+        level = FULL_COMPRESS_LEVEL if final else FAST_COMPRESS_LEVEL
+        self.queue(path, self.write, (snapshot, paletted, level), final)
+
+    def request_animations(self, xml_path, animations):
+        # Metadata edits ride the same coalescing; the XML is patched, never rewritten
+        snapshot = [Animation(**vars(anim)) for anim in animations]
+        self.queue(xml_path, self.write_animations, (snapshot,))
+
+    def queue(self, path, writer, args, urgent=False):
+        with self.cond:
+            self.pending[path] = (writer, args)
+            self.last_request = time.monotonic()
+            self.urgent = self.urgent or urgent
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                wait = self.last_request + self.delay - time.monotonic()
+                if wait > 0 and not self.urgent and not self.closed:
+                    self.cond.wait(wait)
+                    continue
+                batch, self.pending = self.pending, {}
+                self.urgent = False
+                self.writing = True
+
+            for path, (writer, args) in batch.items():
+                writer(path, *args)
+
+            with self.cond:
+                self.writing = False
+                self.cond.notify_all()
+
+    def write(self, path, snapshot, paletted, level):
+        try:
+            save_sheet(snapshot, path, paletted, level)
+        except Exception as e:
+            print(f"[Image Save Error] {e}")
+            return
+        if level == FAST_COMPRESS_LEVEL:
+            self.fast_paths.add(path)
+        else:
+            self.fast_paths.discard(path)
+        print(f"Saved image to {path}")
+
+    def write_animations(self, xml_path, animations):
+        try:
+            if save_animations(xml_path, animations):
+                print(f"Saved animations to {xml_path}")
+        except Exception as e:
+            print(f"[XML Save Error] {e}")
+
+    def flush(self):
+        # Blocks until everything requested so far is on disk
+        with self.cond:
+            if not self.pending and not self.writing:
+                return  # Nothing to hurry; a stale flag would skip the next edit's coalescing
+            self.urgent = True
+            self.cond.notify_all()
+            while self.pending or self.writing:
+                self.cond.wait()
+            self.urgent = False  # A write already under way never takes a new batch to clear it
+
+    def close(self):
+        # Final pass: rewrite every fast-compressed file at full compression
+        self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        for path in sorted(self.fast_paths):
+            try:
+                with Image.open(path) as img:
+                    img.load()
+                    tmp_path = path + ".tmp"
+                    img.save(tmp_path, format=img.format, compress_level=FULL_COMPRESS_LEVEL)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"[Image Save Error] {e}")
+        self.fast_paths.clear()
@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image
+
+from SpritesheetCore import (
+    load_sheet, save_sheet, compact_palette, load_animations, FrameTable, extract_frame, content_hash,
+)
+from SpritesheetIndex import ProjectIndex, OUTPUT_MARKER_NAME
+from SpritesheetAtlas import repack, repacked_xml, packed_name
+from SpritesheetDedup import FrameIndex
+
+# --- Constants ---
+EXPORT_FORMATS = ("gif", "apng", "png")
+EXPORT_MANIFEST_NAME = ".export_manifest.json"
+EXPORT_MANIFEST_VERSION = 2
+EXPORT_DUPLICATES_NAME = "duplicates.json"  # Frames left out by --dedup: file -> the identical frame written instead
+
+# --- Jobs ---
+# Every job takes a Project from the ProjectIndex plus the parsed options and returns a list
+# of report lines. Jobs run in worker processes, so they must stay top-level.
+
+def job_validate(project, options):
+    png_path, xml_path = project.png_path, project.xml_path
+    if not png_path:
+        return ["no png"]
+    if not xml_path:
+        return ["no xml"]
+
+    sheet = load_sheet(png_path)
+    animations = load_animations(xml_path)
+    problems = []
+    outside = set()
+    for a, f, x, y, w, h in FrameTable(animations).rows:
+        if x + w > sheet.width or y + h > sheet.height:
+            outside.add(a)
+    for a in sorted(outside):
+        problems.append(f"{animations[a].name}: frames leave the {sheet.width}x{sheet.height} sheet")
+    return problems or [f"ok, {len(animations)} animations"]
+
+def job_reindex(project, options):
+    png_path = project.png_path
+    if not png_path:
+        return ["no png"]
+
+    sheet = load_sheet(png_path)
+    compacted = compact_palette(sheet)
+    if len(compacted.palette) == len(sheet.palette) and not options.paletted:
+        return [f"palette already compact, {len(sheet.palette)} colors"]
+    if not options.dry_run:
+        save_sheet(compacted, png_path, options.paletted)
+    return [f"{len(sheet.palette)} -> {len(compacted.palette)} colors"]
+
+def job_export(project, options):
+    png_path = project.png_path
+    if not png_path:
+        return ["no png"]
+
+    sheet = load_sheet(png_path)
+    out_path = os.path.join(options.out, project.name.replace('/', '_') + ".png")
+    if not options.dry_run:
+        save_sheet(sheet, out_path, options.paletted)
+    return [f"exported to {out_path}"]
+
+# --- Animation Export ---
+def animation_frames(sheet, anim):
+    # Frames as P images sharing one compacted palette, index 0 transparent
+    stack = np.stack([extract_frame(sheet, anim, i) for i in range(anim.frame_count)])
+    used, inverse = np.unique(stack, return_inverse=True)
+    if used[0] != 0:
+        used = np.concatenate((np.zeros(1, dtype=used.dtype), used))
+        inverse += 1
+    palette = sheet.palette[used]
+    if len(palette) > 0x100:
+        rgba = np.take(sheet.palette, stack, axis=0)
+        return [Image.fromarray(frame, "RGBA") for frame in rgba], stack, palette
+    inverse = inverse.reshape(stack.shape).astype(np.uint8)
+    frames = []
+    for frame in inverse:
+        img = Image.fromarray(frame, "P")
+        img.putpalette(palette.tobytes(), rawmode="RGBA")
+        img.info["transparency"] = 0
+        frames.append(img)
+    return frames, stack, palette
+
+def frame_path(out_base, i):
+    return f"{out_base}_{i:03d}.png"
+
+def write_animation(frames, durations, out_base, export_format, skipped=()):
+    # Returns the written paths; every file goes through a temp name and a rename.
+    # PNG sequences leave out the frames in `skipped`.
+    if export_format == "png":
+        paths = []
+        for i, img in enumerate(frames):
+            if i in skipped:
+                continue
+            path = frame_path(out_base, i)
+            img.save(path + ".tmp", format="PNG")
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+        return paths
+
+    if export_format == "gif":
+        path = out_base + ".gif"
+        frames = [img if img.mode == "P" else img.convert("RGBA") for img in frames]
+        frames[0].save(path + ".tmp", format="GIF", save_all=True, append_images=frames[1:],
+                       duration=durations, loop=0, disposal=2, transparency=0, optimize=False)
+    else:
+        path = out_base + ".png"
+        frames = [img.convert("RGBA") for img in frames]
+        frames[0].save(path + ".tmp", format="PNG", save_all=True, append_images=frames[1:],
+                       duration=durations, loop=0, disposal=1, blend=0)
+    os.replace(path + ".tmp", path)
+    return [path]
+
+def job_animations(project, options):
+    png_path, xml_path = project.png_path, project.xml_path
+    if not png_path or not xml_path:
+        return ["needs a png and an xml"]
+
+    out_dir = os.path.join(options.out, project.name.replace('/', '_'))
+    manifest_path = os.path.join(out_dir, EXPORT_MANIFEST_NAME)
+    manifest = {}
+    try:
+        with open(manifest_path, 'r') as f:
+            store = json.load(f)
+        if store.get("version") == EXPORT_MANIFEST_VERSION:
+            manifest = store["animations"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sheet = load_sheet(png_path)
+    animations = [anim for anim in load_animations(xml_path) if anim.frame_count > 0]  # Nothing to write for empty ones
+    if not options.dry_run:
+        os.makedirs(out_dir, exist_ok=True)
+
+    lines = []
+    skipped = 0
+    duplicates = {}
+    for anim in animations:
+        frames, stack, palette = animation_frames(sheet, anim)
+        durations = [max(10, int(round(anim.frame_wait * 1000)))] * anim.frame_count
+
+        # With --dedup, a PNG frame already exported elsewhere (per the frame index) is not
+        # written again; duplicates.json points at the copy that is
+        aliases = {}
+        if options.format == "png":
+            for i in range(anim.frame_count):
+                first = options.canonical.get((project.name, anim.name, i))
+                if first is not None:
+                    first_project, first_anim, first_frame = first
+                    target = frame_path(os.path.join(options.out, first_project.replace('/', '_'), first_anim), first_frame)
+                    aliases[i] = os.path.relpath(target, out_dir).replace(os.sep, '/')
+
+        # Pixels, colors, timing, format and left-out frames decide whether the previous export still holds
+        digest = content_hash(b"".join((
+            stack.tobytes(), palette.tobytes(),
+            repr((stack.shape, durations, options.format, sorted(aliases.items()))).encode(),
+        )))
+        key = f"{anim.name}.{options.format}"
+        entry = manifest.get(key)
+        out_base = os.path.join(out_dir, anim.name)
+        duplicates.update((os.path.basename(frame_path(out_base, i)), target) for i, target in aliases.items())
+        if entry and entry["hash"] == digest and all(os.path.exists(path) for path in entry["files"]):
+            skipped += 1
+            continue
+        if options.dry_run:
+            lines.append(f"{anim.name}: would export {anim.frame_count - len(aliases)} frames")
+            continue
+        files = write_animation(frames, durations, out_base, options.format, aliases)
+        manifest[key] = {"hash": digest, "files": files}
+        lines.append(f"{anim.name}: {len(files) if options.format == 'png' else anim.frame_count} frames -> {options.format}")
+
+    if not options.dry_run:
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": EXPORT_MANIFEST_VERSION, "animations": manifest}, f)
+        os.replace(tmp_path, manifest_path)
+        duplicates_path = os.path.join(out_dir, EXPORT_DUPLICATES_NAME)
+        if duplicates:
+            with open(duplicates_path + ".tmp", 'w') as f:
+                json.dump(duplicates, f, indent=1, sort_keys=True)
+            os.replace(duplicates_path + ".tmp", duplicates_path)
+        elif os.path.exists(duplicates_path):
+            os.remove(duplicates_path)
+    lines.append(f"{len(animations) - skipped} exported, {skipped} unchanged")
+    return lines
+
+# --- Atlas Repack ---
+def job_repack(project, options):
+    png_path, xml_path = project.png_path, project.xml_path
+    if not png_path or not xml_path:
+        return ["needs a png and an xml"]
+
+    sheet = load_sheet(png_path)
+    hotspots_path = project.hotspots_path
+    hotspots = load_sheet(hotspots_path) if hotspots_path and os.path.exists(hotspots_path) else None
+    with open(xml_path, 'r', encoding='utf-8', errors='replace') as f:
+        xml_data = f.read()
+
+    start = time.perf_counter()
+    packed, packed_hotspots, sprite, placements = repack(sheet, xml_data, hotspots)
+    elapsed = time.perf_counter() - start
+
+    png_name = packed_name(png_path)
+    hotspots_name = packed_name(hotspots_path) if packed_hotspots is not None else None
+    frames = sum(placement.anim.frame_count for placement in placements)
+    shared = sum(placement.shared for placement in placements)
+    lines = [
+        f"{sheet.width}x{sheet.height} -> {packed.width}x{packed.height} "
+        f"({packed.width * packed.height * 100 // max(1, sheet.width * sheet.height)}% of the pixels), "
+        f"{len(placements)} animations ({shared} sharing a strip), {frames} frames packed in {elapsed * 1000:.0f} ms"
+    ]
+    if options.dry_run:
+        return lines
+
+    out_dir = os.path.join(options.out, project.name.replace('/', '_'))
+    os.makedirs(out_dir, exist_ok=True)
+    save_sheet(packed, os.path.join(out_dir, png_name), options.paletted)
+    if packed_hotspots is not None:
+        save_sheet(packed_hotspots, os.path.join(out_dir, hotspots_name), options.paletted)
+    xml_out = os.path.join(out_dir, packed_name(xml_path))
+    with open(xml_out, 'w', encoding='utf-8') as f:
+        f.write(repacked_xml(sprite, placements, png_name, hotspots_name))
+    lines.append(f"wrote {xml_out}")
+    return lines
+
+JOBS = {
+    "validate": job_validate,
+    "reindex": job_reindex,
+    "export": job_export,
+    "animations": job_animations,
+    "repack": job_repack,
+}
+
+def run_job(job_name, project, options):
+    start = time.perf_counter()
+    try:
+        lines = JOBS[job_name](project, options)
+    except Exception as e:
+        lines = [f"[Error] {e}"]
+    return project.name, lines, time.perf_counter() - start
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a job over every sprite project folder in parallel.")
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("base_dir", nargs="?", default=".")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="export", help="output folder for the export, animations and repack jobs (never indexed as projects)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="gif", help="animations job output: gif, apng or a png per frame")
+    parser.add_argument("--paletted", action="store_true", help="write mode \"P\" PNGs when the palette fits")
+    parser.add_argument("--dedup", action="store_true",
+                        help="animations job with --format png: write frames seen elsewhere in the frame index once")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing any files")
+    options = parser.parse_args(argv)
+
+    if options.job in ("export", "animations", "repack") and not options.dry_run:
+        # Marked before the scan, so exported sheets never come back as projects
+        os.makedirs(options.out, exist_ok=True)
+        open(os.path.join(options.out, OUTPUT_MARKER_NAME), 'a').close()
+    projects = ProjectIndex(options.base_dir).scan(save=not options.dry_run)
+    options.canonical = {}
+    if options.dedup and options.job == "animations" and options.format == "png":
+        index = FrameIndex(options.base_dir)
+        index.update(projects, options.jobs, save=not options.dry_run)
+        options.canonical = index.canonical()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, options.jobs)) as pool:
+        futures = [pool.submit(run_job, options.job, project, options) for project in projects]
+        for future in as_completed(futures):
+            name, lines, elapsed = future.result()
+            for line in lines:
+                print(f"[{name}] {line} ({elapsed * 1000:.0f} ms)")
+
+    print(f"{options.job}: {len(projects)} projects in {time.perf_counter() - start:.2f}s with {options.jobs} workers")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
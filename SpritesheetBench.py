@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+from PIL import Image
+
+import nxml
+import SpritesheetCore as core
+
+# --- Constants ---
+BENCH_VERSION = 4  # Bump when cases are renamed or change what they measure
+SIZES = (256, 1024, 4096)
+COLOR_COUNTS = (16, 256, 4096)
+FRAME_SIZE = 32
+VIEW_SIZE = (850, 650)  # Canvas area of the editor window
+PAN_ZOOMS = (0.01, 0.05, 1.0)  # Full-sheet pans: whole sheet in view, about 1:1, the editor's default
+PAN_STEP = (7, 5)              # Screen pixels moved per panned draw, bouncing between the sheet's edges
+PIXEL_SIZE = 20                # Screen pixels per sheet pixel at zoom 1, as in the editor
+EXAMPLE_PNG = os.path.join("example", "player.png")
+EXAMPLE_XML = os.path.join("example", "player.xml")
+
+# --- Timing ---
+def bench(fn, repeat=20):
+    # Best-of and mean wall time in milliseconds; parser debug output is swallowed
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+    return min(times), sum(times) / len(times)
+
+def bounce(travel, lo, hi):
+    # Position after moving `travel` pixels back and forth between hi and lo, starting at hi
+    span = hi - lo
+    if span == 0:
+        return hi
+    t = travel % (2 * span)
+    return hi - (t if t <= span else 2 * span - t)
+
+def repeat_for(pixels, repeat):
+    # Fewer rounds on big sheets so a full run stays in the minutes
+    return max(3, min(repeat, repeat * 256 * 256 // max(1, pixels)))
+
+# --- Synthetic Sheets ---
+def synthetic_image(size, colors, seed=0):
+    # Deterministic sheet: `colors` distinct RGBA values in blocks, a quarter of it transparent
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, size=(colors, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    blocks = rng.integers(0, colors, size=(size // 4, size // 4))
+    rgba = palette[np.repeat(np.repeat(blocks, 4, axis=0), 4, axis=1)]
+    rgba[: size // 4, :, :] = 0
+    return Image.fromarray(rgba, "RGBA")
+
+def synthetic_animations(sheet):
+    rows = sheet.height // FRAME_SIZE
+    count = sheet.width // FRAME_SIZE
+    return [core.Animation(f"row{i}", 0, i * FRAME_SIZE, FRAME_SIZE, FRAME_SIZE, count) for i in range(rows)]
+
+# --- Cases ---
+def bench_sheet(case, png_path, animations, repeat, tmp_dir):
+    rows = []
+    sheet = core.load_sheet(png_path)
+    pixels = sheet.width * sheet.height
+    n = repeat_for(pixels, repeat)
+
+    def add(op, fn, rounds=n):
+        best, mean = bench(fn, rounds)
+        rows.append({"case": case, "op": op, "best_ms": best, "mean_ms": mean, "repeat": rounds})
+
+    with Image.open(png_path) as img:
+        img.load()
+        add("load", lambda: core.load_sheet(png_path))
+        add("palette", lambda: core.build_sheet(img))
+
+    anim = animations[len(animations) // 2]
+    stack = core.frame_stack(sheet, anim)
+    frame = core.extract_frame(sheet, anim, 0)
+    add("load_frame copy", lambda: core.extract_frame(sheet, anim, anim.frame_count // 2), repeat)
+    if stack is not None:
+        add("load_frame view", lambda: stack[anim.frame_count // 2], repeat)
+
+    def store():
+        sheet.mark_dirty(anim.pos_x + 1, anim.pos_y + 1)
+        core.store_frame(sheet, anim, 0, frame)
+    add("save_frame", store, repeat)
+    sheet.unsaved = None
+
+    out_path = os.path.join(tmp_dir, "out.png")
+    add("save", lambda: core.save_sheet(sheet, out_path))
+    if len(sheet.palette) <= 0x100:
+        add("save paletted", lambda: core.save_sheet(sheet, out_path, True))
+
+    rows += bench_draw(case, sheet, anim, frame, repeat)
+    return rows
+
+def bench_draw(case, sheet, anim, frame, repeat):
+    import pygame
+    from SpritesheetRender import FrameRenderer
+
+    pygame.display.init()
+    target = pygame.Surface(VIEW_SIZE, pygame.SRCALPHA, 32)
+    renderer = FrameRenderer(PIXEL_SIZE)
+    rows = []
+
+    def add(op, fn, rounds):
+        best, mean = bench(fn, rounds)
+        rows.append({"case": case, "op": op, "best_ms": best, "mean_ms": mean, "repeat": rounds})
+
+    def draw(key, indices, zoom, cold, offset=(0, 0)):
+        if cold:
+            renderer.invalidate()
+        target.set_clip(None)
+        renderer.draw(target, key, indices, sheet.palette, zoom, offset)
+
+    def pan(zoom):
+        # Each call moves the view, so tiles scroll in and out like dragging with the middle button.
+        # Offsets sweep back and forth over the range that keeps the sheet on screen (or, when it
+        # is bigger than the view, the view on the sheet), so no draw times an empty canvas.
+        ranges = []
+        for view, size in zip(VIEW_SIZE, (sheet.width, sheet.height)):
+            slack = int(view - size * PIXEL_SIZE * zoom)
+            ranges.append((min(0, slack), max(0, slack)))
+        step = [0]
+        def draw_next():
+            step[0] += 1
+            offset = tuple(bounce(step[0] * move, lo, hi) for move, (lo, hi) in zip(PAN_STEP, ranges))
+            draw((None, None), sheet.indices, zoom, False, offset)
+        return draw_next
+
+    add("draw_frame cold", lambda: draw((0, 0), frame, 1.0, True), repeat)
+    add("draw_frame warm", lambda: draw((0, 0), frame, 1.0, False), repeat)
+    rounds = repeat_for(sheet.width * sheet.height, repeat)
+    add("draw_sheet cold", lambda: draw((None, None), sheet.indices, 1.0, True), rounds)
+    add("draw_sheet warm", lambda: draw((None, None), sheet.indices, 1.0, False), rounds)
+    for zoom in PAN_ZOOMS:
+        renderer.invalidate()
+        add(f"draw_sheet pan {zoom:g}", pan(zoom), repeat * 5)
+    return rows
+
+def bench_xml(paths, repeat):
+    rows = []
+    for path in paths:
+        with open(path, 'r') as f:
+            data = f.read()
+        cases = [
+            ("nxml.py parse", lambda: nxml.parse(data)),
+            ("nxml.py parse + animations", lambda: core.parse_animations(nxml.parse(data))),
+        ]
+        if core.LuaRuntime is not None:
+            lua_nxml = core.load_lua_nxml()
+            cases += [
+                ("nxml.lua parse", lambda: lua_nxml.parse(data)),
+                ("nxml.lua parse + flatten", lambda: core.parse_xml_lua(data)),
+                ("nxml.lua parse + animations", lambda: core.parse_animations(core.parse_xml_lua(data))),
+            ]
+        for op, fn in cases:
+            best, mean = bench(fn, repeat)
+            rows.append({"case": path, "op": op, "best_ms": best, "mean_ms": mean, "repeat": repeat})
+    return rows
+
+# --- Suite ---
+def run_suite(options):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in options.sizes:
+            for colors in options.colors:
+                case = f"synthetic {size}x{size} {colors} colors"
+                print(f"[Bench] {case}", file=sys.stderr)
+                png_path = os.path.join(tmp_dir, f"sheet_{size}_{colors}.png")
+                synthetic_image(size, colors).save(png_path)
+                sheet = core.load_sheet(png_path)
+                rows += bench_sheet(case, png_path, synthetic_animations(sheet), options.repeat, tmp_dir)
+
+        if os.path.exists(EXAMPLE_PNG) and os.path.exists(EXAMPLE_XML):
+            print(f"[Bench] {EXAMPLE_PNG}", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                animations = core.load_animations(EXAMPLE_XML)
+            rows += bench_sheet(EXAMPLE_PNG, EXAMPLE_PNG, animations, options.repeat, tmp_dir)
+
+    rows += bench_xml(options.xmls, options.repeat)
+    return rows
+
+def environment():
+    import pygame
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__,
+        "pygame": pygame.version.ver,
+        "lupa": core.LuaRuntime is not None,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(rows, baseline_path):
+    # Ratio of best times against an earlier run, per (case, op)
+    with open(baseline_path, 'r') as f:
+        baseline = {(r["case"], r["op"]): r["best_ms"] for r in json.load(f)["results"]}
+    for row in rows:
+        old = baseline.get((row["case"], row["op"]))
+        if old:
+            row["baseline_ms"] = old
+            row["ratio"] = row["best_ms"] / old
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the editor's hot paths on synthetic sheets and the example assets.")
+    parser.add_argument("xmls", nargs="*", default=[EXAMPLE_XML])
+    parser.add_argument("-n", "--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--colors", type=int, nargs="+", default=list(COLOR_COUNTS))
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    options = parser.parse_args(argv)
+
+    rows = run_suite(options)
+    if options.baseline:
+        compare(rows, options.baseline)
+
+    for row in rows:
+        line = f"{row['case']:36} {row['op']:28} best {row['best_ms']:9.3f} ms  mean {row['mean_ms']:9.3f} ms"
+        if "ratio" in row:
+            line += f"  x{row['ratio']:.2f}"
+        print(line)
+
+    if options.output:
+        report = {"version": BENCH_VERSION, "time": time.time(), "environment": environment(), "results": rows}
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
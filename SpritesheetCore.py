@@ -0,0 +1,649 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+import nxml
+
+try:
+    from lupa import LuaRuntime
+except ImportError:
+    LuaRuntime = None
+
+# --- Constants ---
+DEFAULT_FRAME_WAIT = 0.2
+DIRTY_RECT_LIMIT = 64  # Collapse the dirty set into its bounds past this many rects
+UNDO_LIMIT = 100
+UNDO_MEMORY_BUDGET = 16 * 1024 * 1024  # Bytes of patch data kept across undo and redo
+ANIMATION_CACHE_NAME = ".spritesheet_cache.json"
+ANIMATION_CACHE_VERSION = 3  # Bump whenever Animation or parse_animations changes shape
+NXML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nxml.lua")
+
+# Debug output is formatted lazily, so it costs nothing unless the level is enabled
+log = logging.getLogger("spritesheet")
+
+# --- XML Parsers ---
+# The native parser is the default; the nxml.lua bridge is kept for comparison when lupa is installed
+parse_xml = nxml.parse
+
+lua_runtime = None  # One LuaRuntime per process, created the first time nxml.lua is needed
+lua_nxml = None
+lua_parse_flat = None
+lua_lock = threading.Lock()
+
+def load_lua_nxml():
+    global lua_runtime, lua_nxml, lua_parse_flat
+    with lua_lock:
+        if lua_nxml is None:
+            if LuaRuntime is None:
+                raise ImportError("nxml.lua needs lupa")
+            lua = lua_runtime = LuaRuntime(unpack_returned_tuples=True)
+            lua_nxml = lua.eval("dofile")(NXML_PATH)
+            lua_parse_flat = lua.eval("function(nxml) return function(data) return nxml.flatten(nxml.parse(data)) end end")(lua_nxml)
+    return lua_nxml
+
+def parse_xml_lua(data):
+    # Parse and flatten run in one Lua call; the tree crosses the bridge as a single string
+    load_lua_nxml()
+    return lua_to_element(lua_parse_flat(data))
+
+def lua_to_element(flat):
+    # Rebuilds nxml.Element from the nxml.flatten() string
+    fields = flat.split("\0")
+    elem, _ = unflatten(fields, 0)
+    return elem
+
+def unflatten(fields, i):
+    name, attr_count = fields[i], int(fields[i + 1])
+    i += 2
+    attr = dict(zip(fields[i:i + 2 * attr_count:2], fields[i + 1:i + 2 * attr_count:2]))
+    i += 2 * attr_count
+    content_count = int(fields[i])
+    content = fields[i + 1:i + 1 + content_count] if content_count else None
+    i += 1 + content_count
+    child_count = int(fields[i])
+    i += 1
+    children = []
+    for _ in range(child_count):
+        child, i = unflatten(fields, i)
+        children.append(child)
+    elem = nxml.Element(name, attr, children)
+    elem.content = content
+    return elem, i
+
+# --- Animation Data Structure ---
+class Animation:
+    def __init__(self, name, pos_x, pos_y, frame_width, frame_height, frame_count, frame_wait=DEFAULT_FRAME_WAIT,
+                 is_default=False, frames_per_row=0, parent=None):
+        self.name = name
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.frame_count = frame_count
+        self.frame_wait = frame_wait
+        self.is_default = is_default
+        self.frames_per_row = frames_per_row  # 0: every frame on one row
+        self.parent = parent  # Name of the animation this one inherits from, if any
+
+# --- Sheet Data Structure ---
+class Sheet:
+    def __init__(self, indices, palette):
+        self.indices = indices  # (h, w) palette indices, uint8 or uint16
+        self.palette = palette  # (n, 4) uint8 RGBA, index 0 is always transparent
+        self.height, self.width = indices.shape
+        self.dirty = set()    # (x, y, w, h) edited on the canvas, not yet written back
+        self.unsaved = None   # (x0, y0, x1, y1) written back, not yet saved to disk
+
+    def mark_dirty(self, x, y, w=1, h=1):
+        self.dirty.add((x, y, w, h))
+        if len(self.dirty) > DIRTY_RECT_LIMIT:
+            x0, y0, x1, y1 = rect_bounds(self.dirty)
+            self.dirty = {(x0, y0, x1 - x0, y1 - y0)}
+
+def index_dtype(color_count):
+    if color_count <= 0x100:
+        return np.uint8
+    if color_count <= 0x10000:
+        return np.uint16
+    return np.uint32
+
+def build_sheet(img):
+    rgba = np.ascontiguousarray(np.asarray(img.convert("RGBA"), dtype=np.uint8))
+    packed = rgba.view("<u4")[..., 0]
+
+    # One pass: sorted unique colors plus the index of every pixel into them
+    colors, inverse = np.unique(packed, return_inverse=True)
+    inverse = inverse.reshape(packed.shape)
+
+    # Packed (0, 0, 0, 0) is 0 and sorts first; reserve it so erasing always means transparent
+    if colors.size == 0 or colors[0] != 0:
+        colors = np.concatenate((np.zeros(1, dtype="<u4"), colors)).astype("<u4")
+        inverse += 1
+
+    indices = np.ascontiguousarray(inverse, dtype=index_dtype(len(colors)))
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    return Sheet(indices, palette)
+
+def compact_palette(sheet):
+    # Drop palette entries no pixel uses, keeping index 0 transparent
+    used, inverse = np.unique(sheet.indices, return_inverse=True)
+    if used.size == 0 or used[0] != 0:
+        used = np.concatenate((np.zeros(1, dtype=used.dtype), used))
+        inverse += 1
+    indices = np.ascontiguousarray(inverse.reshape(sheet.indices.shape), dtype=index_dtype(len(used)))
+    return Sheet(indices, np.ascontiguousarray(sheet.palette[used]))
+
+def rect_bounds(rects, bounds=None):
+    for x, y, w, h in rects:
+        if bounds is None:
+            bounds = (x, y, x + w, y + h)
+        else:
+            bounds = (min(bounds[0], x), min(bounds[1], y), max(bounds[2], x + w), max(bounds[3], y + h))
+    return bounds
+
+def sheet_to_image(sheet, paletted=False):
+    h, w = sheet.height, sheet.width
+    if paletted and len(sheet.palette) <= 0x100:
+        img = Image.frombytes("P", (w, h), sheet.indices.astype(np.uint8, copy=False).tobytes())
+        img.putpalette(sheet.palette.tobytes(), rawmode="RGBA")
+        return img
+
+    # One palette gather for the whole sheet instead of a putpixel per pixel
+    rgba = np.take(sheet.palette, sheet.indices, axis=0)
+    return Image.frombytes("RGBA", (w, h), rgba.tobytes())
+
+def load_sheet(path):
+    with Image.open(path) as img:
+        return build_sheet(img)
+
+def save_sheet(sheet, path, paletted=False, compress_level=None):
+    # Written next to the target and renamed over it, so a crash never leaves half a PNG
+    img = sheet_to_image(sheet, paletted)
+    image_format = Image.registered_extensions().get(os.path.splitext(path)[1].lower(), "PNG")
+    options = {} if compress_level is None else {"compress_level": compress_level}
+    tmp_path = path + ".tmp"
+    img.save(tmp_path, format=image_format, **options)
+    os.replace(tmp_path, path)
+    sheet.unsaved = None
+
+def blank_sheet(width, height, palette=None):
+    if palette is None:
+        palette = np.zeros((1, 4), dtype=np.uint8)
+    indices = np.zeros((height, width), dtype=index_dtype(len(palette)))
+    return Sheet(indices, np.array(palette, dtype=np.uint8))
+
+def ensure_colors(sheet, colors):
+    # Append any RGBA color the palette lacks, widening the indices if it outgrows them
+    known = set(map(tuple, sheet.palette.tolist()))
+    missing = [color for color in colors if tuple(color) not in known]
+    if not missing:
+        return
+    sheet.palette = np.concatenate((sheet.palette, np.array(missing, dtype=np.uint8)))
+    dtype = index_dtype(len(sheet.palette))
+    if sheet.indices.dtype != dtype:
+        sheet.indices = sheet.indices.astype(dtype)
+
+# --- Layers ---
+# Index planes aligned with the visual sheet. Every layer has its own palette and file,
+# and only the visual layer is read when a project opens.
+LAYER_NAMES = ("visual", "hotspots", "stains")
+STAINS_SUFFIX = "_stains"
+
+def hotspot_colors(xml_path):
+    # <Hotspot name="eye" color="880000" /> entries become the hotspot layer's palette
+    try:
+        with open(xml_path, 'r', encoding='utf-8', errors='replace') as f:
+            sprite = parse_xml(f.read())
+    except OSError:
+        return []
+    colors = []
+    for hotspot in sprite.each_of("Hotspot") if sprite else ():
+        value = hotspot.get("color", "")
+        try:
+            rgb = int(value, 16)
+        except ValueError:
+            continue
+        colors.append(((rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF, 0xFF))
+    return colors
+
+class Layer:
+    def __init__(self, name, path, xml_path=None, sheet=None):
+        self.name = name
+        self.path = path
+        self.xml_path = xml_path  # Hotspot colors come from here
+        self.sheet = sheet
+
+    def load(self, visual):
+        # Lazily read the layer, or start a blank one the size of the visual sheet
+        if self.sheet is not None:
+            return self.sheet
+        if os.path.exists(self.path):
+            sheet = load_sheet(self.path)
+            if (sheet.width, sheet.height) != (visual.width, visual.height):
+                log.warning("Layer %s is %dx%d, expected %dx%d", self.path, sheet.width, sheet.height, visual.width, visual.height)
+        else:
+            # Hotspots start from their XML colors only; other layers borrow the visual palette
+            sheet = blank_sheet(visual.width, visual.height, None if self.xml_path else visual.palette)
+        if self.xml_path:
+            ensure_colors(sheet, hotspot_colors(self.xml_path))
+        self.sheet = sheet
+        return sheet
+
+def project_layers(png_path, sheet=None, hotspots_path=None, xml_path=None):
+    layers = [Layer("visual", png_path, sheet=sheet)]
+    if hotspots_path:
+        layers.append(Layer("hotspots", hotspots_path, xml_path))
+    stem, ext = os.path.splitext(png_path)
+    layers.append(Layer("stains", stem + STAINS_SUFFIX + ext))
+    return layers
+
+# --- Frames ---
+def frame_origin(anim, frame_index):
+    # Frames run left to right and wrap to the next row every frames_per_row (0: one row)
+    row, column = divmod(frame_index, anim.frames_per_row) if anim.frames_per_row > 0 else (0, frame_index)
+    return anim.pos_x + column * anim.frame_width, anim.pos_y + row * anim.frame_height
+
+def frame_rect(anim, frame_index):
+    frame_x, frame_y = frame_origin(anim, frame_index)
+    return frame_x, frame_y, anim.frame_width, anim.frame_height
+
+def rect_clip(sheet, rect):
+    frame_x, frame_y, fw, fh = rect
+    w = max(0, min(fw, sheet.width - frame_x))
+    h = max(0, min(fh, sheet.height - frame_y))
+    return w, h
+
+def extract_rect(sheet, rect):
+    frame_x, frame_y, fw, fh = rect
+    w, h = rect_clip(sheet, rect)
+
+    # Frame-sized copy, padded with transparency where the frame leaves the sheet
+    frame = np.zeros((fh, fw), dtype=sheet.indices.dtype)
+    frame[:h, :w] = sheet.indices[frame_y:frame_y + h, frame_x:frame_x + w]
+    return frame
+
+def extract_frame(sheet, anim, frame_index):
+    return extract_rect(sheet, frame_rect(anim, frame_index))
+
+def frame_stack(sheet, anim):
+    # (frame_count, frame_height, frame_width) view into the sheet, built once per animation.
+    # Each slice is a frame; painting on it paints the sheet. None if a frame leaves the sheet
+    # or the frames wrap onto a second row.
+    x, y = anim.pos_x, anim.pos_y
+    n, fw, fh = anim.frame_count, anim.frame_width, anim.frame_height
+    if n <= 0 or fw <= 0 or fh <= 0 or x < 0 or y < 0:
+        return None
+    if 0 < anim.frames_per_row < n:
+        return None
+    if x + n * fw > sheet.width or y + fh > sheet.height:
+        return None
+    strip = sheet.indices[y:y + fh, x:x + n * fw]
+    return strip.reshape(fh, n, fw).transpose(1, 0, 2)
+
+def store_rect(sheet, rect, frame):
+    if not sheet.dirty:
+        return
+
+    # Frames from frame_stack already live in the sheet; padded copies need the dirty cells copied back
+    if not np.may_share_memory(frame, sheet.indices):
+        frame_x, frame_y = rect[:2]
+        fw, fh = rect_clip(sheet, rect)
+        for x, y, w, h in sheet.dirty:
+            x0, y0 = max(x, frame_x), max(y, frame_y)
+            x1, y1 = min(x + w, frame_x + fw), min(y + h, frame_y + fh)
+            if x0 < x1 and y0 < y1:
+                sheet.indices[y0:y1, x0:x1] = frame[y0 - frame_y:y1 - frame_y, x0 - frame_x:x1 - frame_x]
+    sheet.unsaved = rect_bounds(sheet.dirty, sheet.unsaved)
+    sheet.dirty.clear()
+
+def store_frame(sheet, anim, frame_index, frame):
+    store_rect(sheet, frame_rect(anim, frame_index), frame)
+
+class FrameTable:
+    # Flat (animation, frame, x, y, w, h) row per frame of every animation, laid out once
+    # per project so the editor looks frames up by index instead of recomputing offsets
+    def __init__(self, animations):
+        self.rows = []
+        self.first = []  # animation index -> its first row
+        for a, anim in enumerate(animations):
+            self.first.append(len(self.rows))
+            for f in range(anim.frame_count):
+                self.rows.append((a, f) + frame_rect(anim, f))
+
+    def rect(self, animation, frame):
+        return self.rows[self.first[animation] + frame][2:]
+
+# --- Undo History ---
+class Patch:
+    def __init__(self, layer, animation, frame, xs, ys, old, new):
+        self.layer = layer
+        self.animation = animation  # Patches are frame-local; they remember which layer and frame they belong to
+        self.frame = frame
+        self.xs = xs
+        self.ys = ys
+        self.old = old
+        self.new = new
+        self.nbytes = xs.nbytes + ys.nbytes + old.nbytes + new.nbytes
+
+class UndoHistory:
+    def __init__(self, limit=UNDO_LIMIT, budget=UNDO_MEMORY_BUDGET):
+        self.limit = limit
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.used = 0
+        self.stroke = None  # ((layer, animation, frame), {(x, y): [old, new]}) while painting
+
+    def record(self, where, x, y, old, new):
+        if self.stroke is not None and self.stroke[0] != where:
+            self.end_stroke()
+        if self.stroke is None:
+            self.stroke = (where, {})
+        cells = self.stroke[1]
+        if (x, y) in cells:
+            cells[(x, y)][1] = new
+        else:
+            cells[(x, y)] = [old, new]
+
+    def record_cells(self, where, xs, ys, old, new):
+        # An interpolated run of cells joins the open stroke like single cells do
+        for x, y, value in zip(xs.tolist(), ys.tolist(), old.tolist()):
+            self.record(where, x, y, value, new)
+
+    def record_patch(self, where, xs, ys, old, new):
+        # A finished operation (line, fill) becomes one patch of its own. old and new may be a
+        # single value for the whole patch, kept as one-element arrays so fills stay small.
+        self.end_stroke()
+        if len(xs) == 0:
+            return
+        old, new = (np.atleast_1d(np.asarray(values, dtype=np.int32)) for values in (old, new))
+        self.push(Patch(*where, xs.astype(np.int32), ys.astype(np.int32), old, new))
+
+    def end_stroke(self):
+        if self.stroke is None:
+            return
+        where, cells = self.stroke
+        self.stroke = None
+        changed = [(x, y, old, new) for (x, y), (old, new) in cells.items() if old != new]
+        if not changed:
+            return
+        xs, ys, old, new = (np.array(column, dtype=np.int32) for column in zip(*changed))
+        self.push(Patch(*where, xs, ys, old, new))
+
+    def push(self, patch):
+        self.undo_stack.append(patch)
+        self.used += patch.nbytes
+        for stale in self.redo_stack:
+            self.used -= stale.nbytes
+        self.redo_stack.clear()
+        while len(self.undo_stack) > self.limit or (self.used > self.budget and len(self.undo_stack) > 1):
+            self.used -= self.undo_stack.popleft().nbytes
+
+    def undo(self):
+        self.end_stroke()
+        if not self.undo_stack:
+            return None
+        patch = self.undo_stack.pop()
+        self.redo_stack.append(patch)
+        return patch
+
+    def redo(self):
+        self.end_stroke()
+        if not self.redo_stack:
+            return None
+        patch = self.redo_stack.pop()
+        self.undo_stack.append(patch)
+        return patch
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.used = 0
+        self.stroke = None
+
+# --- Projects ---
+def parse_animations(anim_data):
+    animations = []
+
+    log.debug("Parsing animations from XML data: %s", anim_data)
+
+    if not anim_data:
+        log.debug("No animation data provided")
+        return animations
+
+    log.debug("Found %d children in XML", len(anim_data.children))
+
+    default_animation = anim_data.get('default_animation')
+
+    log.debug("Default animation: %s", default_animation)
+
+    rect_animations = anim_data.all_of("RectAnimation")
+
+    # Find default animation data first
+    default_anim_data = None
+    for child in rect_animations:
+        if child.get('name') == default_animation:
+            default_anim_data = child
+            log.debug("Found default animation data")
+            break
+
+    if not default_anim_data:
+        log.debug("No default animation found, using first RectAnimation")
+        # If no default found, use first RectAnimation
+        for child in rect_animations:
+            if 'frame_width' in child.attr and 'frame_height' in child.attr:
+                default_anim_data = child
+                break
+
+    if not default_anim_data:
+        log.debug("No suitable default animation found")
+        return animations
+
+    # Get default frame dimensions
+    default_frame_width = int(default_anim_data.get('frame_width'))
+    default_frame_height = int(default_anim_data.get('frame_height'))
+    default_frames_per_row = int(default_anim_data.get('frames_per_row', 0))
+
+    log.debug("Default frame dimensions: %dx%d", default_frame_width, default_frame_height)
+
+    # Metadata rects are not animations; everything else is addressable by name for parent=
+    elements = {}
+    for child in rect_animations:
+        if 'state' in child.attr:
+            log.debug("Skipping metadata: %s", child.attr.get('name', 'unknown'))
+        elif 'name' not in child.attr:
+            log.debug("Skipping RectAnimation without name")
+        else:
+            elements.setdefault(child.attr['name'], child)
+
+    # Rows past the default animation may leave out their position: they share its pos_x
+    # and sit one row stride below the previous animation
+    default_x = int(default_anim_data.get('pos_x', 0))
+    row_stride = default_frame_height
+    own_rows = [child for child in elements.values() if 'parent' not in child.attr]
+    if default_anim_data in own_rows:
+        following = own_rows[own_rows.index(default_anim_data) + 1:]
+        if following and 'pos_y' in following[0].attr:
+            row_stride = int(following[0].attr['pos_y']) - int(default_anim_data.get('pos_y', 0))
+
+    resolved = {}  # name -> Animation
+    past_default = False
+    row_y = None
+    for child in own_rows:
+        attr = child.attr
+        name = attr['name']
+        is_default = child is default_anim_data
+        past_default = past_default or is_default
+
+        if 'pos_x' in attr:
+            pos_x = int(attr['pos_x'])
+        else:
+            pos_x = default_x if past_default else 0
+        if 'pos_y' in attr:
+            pos_y = int(attr['pos_y'])
+        else:
+            pos_y = row_y + row_stride if past_default and row_y is not None else 0
+        if past_default:
+            row_y = pos_y
+
+        frame_width = int(attr.get('frame_width', default_frame_width))
+        frame_height = int(attr.get('frame_height', default_frame_height))
+        frame_count = int(attr.get('frame_count', 1))
+        frame_wait = float(attr.get('frame_wait', DEFAULT_FRAME_WAIT))
+        frames_per_row = int(attr.get('frames_per_row', default_frames_per_row))
+
+        log.debug("Adding animation: %s at (%d, %d) %dx%d with %d frames", name, pos_x, pos_y, frame_width, frame_height, frame_count)
+        resolved[name] = Animation(name, pos_x, pos_y, frame_width, frame_height, frame_count, frame_wait,
+                                   is_default, frames_per_row)
+
+    # Child animations start from their resolved parent and override what they set themselves;
+    # each parent is resolved once however many children point at it
+    def inherit(child, chain):
+        name = child.attr['name']
+        if name in resolved:
+            return resolved[name]
+        parent = elements.get(child.attr['parent'])
+        if parent is None or parent.attr['name'] in chain:
+            log.debug("Skipping animation with missing or circular parent: %s", name)
+            return None
+        base = inherit(parent, chain | {name})
+        if base is None:
+            return None
+
+        fields = dict(vars(base), name=name, is_default=False, parent=parent.attr['name'])
+        for key in ("pos_x", "pos_y", "frame_width", "frame_height", "frame_count", "frames_per_row"):
+            if key in child.attr:
+                fields[key] = int(child.attr[key])
+        if 'frame_wait' in child.attr:
+            fields['frame_wait'] = float(child.attr['frame_wait'])
+        log.debug("Adding animation: %s inheriting from %s", name, fields['parent'])
+        resolved[name] = Animation(**fields)
+        return resolved[name]
+
+    for child in elements.values():
+        if 'parent' in child.attr:
+            inherit(child, frozenset())
+
+    # Document order, so the panel lists animations the way the XML does
+    animations = [resolved[name] for name in elements if name in resolved]
+
+    log.debug("Total animations loaded: %d", len(animations))
+    return animations
+
+def load_animations(xml_path):
+    with open(xml_path, 'r') as f:
+        xml_content = f.read()
+    return parse_animations(parse_xml(xml_content))
+
+# RectAnimation attributes the editor can change, in the order new elements are written
+ANIMATION_ATTRS = ("pos_x", "pos_y", "frame_width", "frame_height", "frame_count", "frame_wait")
+
+def attr_number(value):
+    # Full precision and never exponent form, so values read back exactly and Noita can parse them
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+def save_animations(xml_path, animations):
+    # Patches only the attributes that changed, so comments, ordering and indentation
+    # survive; animations missing from the file are appended as new RectAnimations
+    with open(xml_path, 'r', newline='') as f:
+        data = f.read()
+    sprite = parse_xml(data)
+    elements = {child.get('name'): child for child in sprite.each_of("RectAnimation") if 'state' not in child.attr}
+    by_name = {anim.name: anim for anim in animations}
+
+    def depth(anim, seen=()):
+        parent = by_name.get(anim.parent)
+        return 0 if parent is None or parent.name in seen else 1 + depth(parent, seen + (anim.name,))
+
+    # Compared against what the file resolves to, parents first, so defaulted and inherited
+    # attributes stay implicit when a child simply follows its edited parent
+    levels = {}
+    for anim in animations:
+        levels.setdefault(depth(anim), []).append(anim)
+    for level in sorted(levels):
+        parsed = {anim.name: anim for anim in parse_animations(sprite)}
+        for anim in levels[level]:
+            child = elements.get(anim.name)
+            if child is None:
+                attr = {"name": anim.name}
+                attr.update((key, attr_number(getattr(anim, key))) for key in ANIMATION_ATTRS)
+                sprite.children.append(nxml.Element("RectAnimation", attr))
+                continue
+            old = parsed.get(anim.name)
+            for key in ANIMATION_ATTRS:
+                value = getattr(anim, key)
+                if old is None or getattr(old, key) != value:
+                    child.attr[key] = attr_number(value)
+
+    patched = nxml.patch(data, sprite)
+    if patched == data:
+        return False
+    tmp_path = xml_path + ".tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        f.write(patched)
+    os.replace(tmp_path, xml_path)
+    return True
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# --- Animation Cache ---
+class AnimationCache:
+    # One shared store per project root, keyed by XML path relative to it.
+    # mtime and size decide whether a file needs to be read at all; the content hash
+    # decides whether it needs to be parsed again after a touch or a copy.
+    def __init__(self, root='.'):
+        self.root = root
+        self.path = os.path.join(root, ANIMATION_CACHE_NAME)
+        self.entries = {}
+        self.changed = False
+        self.lock = threading.Lock()  # Projects load on worker threads
+        try:
+            with open(self.path, 'r') as f:
+                store = json.load(f)
+            if store.get("version") == ANIMATION_CACHE_VERSION:
+                self.entries = store["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def load(self, xml_path):
+        key = os.path.relpath(os.path.abspath(xml_path), os.path.abspath(self.root))
+        st = os.stat(xml_path)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return [Animation(**fields) for fields in entry["animations"]]
+
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        if entry and entry["hash"] == digest:
+            animations = [Animation(**fields) for fields in entry["animations"]]
+        else:
+            animations = parse_animations(parse_xml(data.decode('utf-8', errors='replace')))
+
+        with self.lock:
+            self.entries[key] = {
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "hash": digest,
+                "animations": [vars(anim) for anim in animations],
+            }
+            self.changed = True
+        return animations
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": ANIMATION_CACHE_VERSION, "entries": self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.changed = False
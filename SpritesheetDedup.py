@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from SpritesheetCore import load_sheet, load_animations, extract_frame, content_hash
+from SpritesheetIndex import ProjectIndex
+from SpritesheetLoader import file_stamp
+
+# --- Constants ---
+FRAME_INDEX_NAME = ".spritesheet_frames.json"
+FRAME_INDEX_VERSION = 1
+
+# --- Frame Hashing ---
+def frame_hashes(sheet, anim):
+    # One hash per frame over its RGBA pixels, so frames match across sheets with different
+    # palettes. Fully transparent frames hash to None and never count as duplicates.
+    stack = np.stack([extract_frame(sheet, anim, i) for i in range(anim.frame_count)])
+    rgba = np.take(sheet.palette, stack, axis=0)
+    shape = f"{anim.frame_width}x{anim.frame_height}".encode()
+    opaque = (stack != 0).reshape(len(stack), -1).any(axis=1)
+    return [content_hash(shape + frame.tobytes()) if visible else None for frame, visible in zip(rgba, opaque)]
+
+def hash_project(png_path, xml_path):
+    # Runs in a worker process; returns [[animation, frame, hash], ...]
+    sheet = load_sheet(png_path)
+    frames = []
+    for anim in load_animations(xml_path):
+        if anim.parent is not None:
+            continue  # Same frames as its parent, not a copy worth reporting
+        if anim.frame_count == 0:
+            continue
+        for i, digest in enumerate(frame_hashes(sheet, anim)):
+            frames.append([anim.name, i, digest])
+    return frames
+
+# --- Frame Index ---
+class FrameIndex:
+    # Frame hashes per project, keyed by sheet path relative to the root. A project is
+    # hashed again only when its PNG or XML stamp changes.
+    def __init__(self, root='.'):
+        self.root = root
+        self.path = os.path.join(root, FRAME_INDEX_NAME)
+        self.projects = {}  # relative png path -> {"name", "png", "xml", "frames"}
+        try:
+            with open(self.path, 'r') as f:
+                store = json.load(f)
+            if store.get("version") == FRAME_INDEX_VERSION:
+                self.projects = store["projects"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+
+    def update(self, projects, jobs=None, save=True):
+        # Returns how many projects were hashed again
+        current = {}
+        stale = []
+        for project in projects:
+            if not project.png_path or not project.xml_path:
+                continue
+            key = self.key(project.png_path)
+            # Lists, as the stamps read back from JSON
+            png, xml = (list(stamp) if stamp else None for stamp in file_stamp(project.png_path, project.xml_path))
+            entry = self.projects.get(key)
+            if entry and entry["png"] == png and entry["xml"] == xml:
+                current[key] = entry
+            else:
+                current[key] = {"name": project.name, "png": png, "xml": xml, "frames": []}
+                stale.append((key, project))
+
+        if stale:
+            with ProcessPoolExecutor(max_workers=max(1, jobs or os.cpu_count())) as pool:
+                futures = [(key, pool.submit(hash_project, project.png_path, project.xml_path)) for key, project in stale]
+                for key, future in futures:
+                    try:
+                        current[key]["frames"] = future.result()
+                    except Exception as e:
+                        print(f"[Frame Index Error] {current[key]['name']}: {e}")
+                        # Keep the old entry and its old stamps (or none), so the next run hashes it again
+                        if key in self.projects:
+                            current[key] = self.projects[key]
+                        else:
+                            del current[key]
+
+        self.projects = current
+        if save:
+            self.save()
+        return len(stale)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": FRAME_INDEX_VERSION, "projects": self.projects}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[Frame Index Save Error] {e}")
+
+    def duplicates(self):
+        # {hash: [(project name, animation, frame), ...]} for every frame seen more than once
+        groups = {}
+        for entry in self.projects.values():
+            for anim, frame, digest in entry["frames"]:
+                if digest is not None:
+                    groups.setdefault(digest, []).append((entry["name"], anim, frame))
+        return {digest: where for digest, where in groups.items() if len(where) > 1}
+
+    def canonical(self):
+        # (project name, animation, frame) -> the first identical frame; the export job writes
+        # that one and lists the others as copies of it
+        mapping = {}
+        for where in self.duplicates().values():
+            first = where[0]
+            for other in where[1:]:
+                mapping[other] = first
+        return mapping
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find identical frames within and across sprite sheets.")
+    parser.add_argument("base_dir", nargs="?", default=".")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="print the duplicate groups as JSON")
+    options = parser.parse_args(argv)
+
+    # Keep stdout clean for --json
+    with contextlib.redirect_stdout(sys.stderr if options.json else sys.stdout):
+        projects = ProjectIndex(options.base_dir).scan()
+        index = FrameIndex(options.base_dir)
+        start = time.perf_counter()
+        rehashed = index.update(projects, options.jobs)
+    groups = index.duplicates()
+
+    if options.json:
+        print(json.dumps([[list(where) for where in group] for group in groups.values()], indent=1))
+        return 0
+
+    for where in sorted(groups.values(), key=len, reverse=True):
+        print(f"{len(where)} copies:")
+        for name, anim, frame in where:
+            print(f"  {name} {anim}[{frame}]")
+    frames = sum(len(entry["frames"]) for entry in index.projects.values())
+    redundant = sum(len(where) - 1 for where in groups.values())
+    print(f"{frames} frames in {len(index.projects)} projects, {redundant} redundant, "
+          f"{rehashed} projects hashed in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import SpritesheetCore as core
+from SpritesheetIndex import SKIPPED_DIRS, XML_HEAD_BYTES
+
+# --- Constants ---
+ENTITY_TAG_RE = re.compile(rb'<\s*Entity\b')
+SPRITE_ATTRS = ("image_file", "sprite_file")  # Component attributes that point at a sprite XML or PNG
+SPRITE_EXTENSIONS = (".xml", ".png")
+
+# --- Mod Files ---
+class ModFiles:
+    # Maps the game's virtual paths onto disk: "mods/<name>/..." next to the mod folder,
+    # "data/..." under an extracted data folder when one is given
+    def __init__(self, mod_root, data_root=None):
+        self.mod_root = os.path.abspath(mod_root)
+        self.mods_dir = os.path.dirname(self.mod_root)
+        self.data_root = data_root
+
+    def virtual(self, path):
+        rel = os.path.relpath(path, self.mods_dir).replace('\\', '/')
+        return "mods/" + rel
+
+    def resolve(self, path):
+        path = path.replace('\\', '/')
+        head, _, rest = path.partition('/')
+        if head == "mods":
+            return os.path.join(self.mods_dir, rest)
+        if head == "data":
+            return os.path.join(self.data_root, path) if self.data_root else None
+        return path
+
+    def exists(self, path):
+        real = self.resolve(path)
+        return real is not None and os.path.isfile(real)
+
+    def read(self, path):
+        with open(self.resolve(path), 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+def entity_files(mod_root):
+    # XML files whose root tag is Entity, judged from the head like the project index does
+    found = []
+    for dirpath, dirnames, filenames in os.walk(mod_root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d not in SKIPPED_DIRS)
+        for name in sorted(filenames):
+            if not name.lower().endswith('.xml'):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                with open(path, 'rb') as f:
+                    head = f.read(XML_HEAD_BYTES)
+            except OSError:
+                continue
+            if ENTITY_TAG_RE.search(head):
+                found.append(path)
+    return found
+
+# --- Base Expansion ---
+class EntityExpander:
+    # Expands <Base file=...> through nxml.lua. Each base file is parsed once per expander
+    # and shared by every entity that includes it; entities go to Lua in batches.
+    def __init__(self, files):
+        core.load_lua_nxml()
+        self.files = files
+        self.cache = core.lua_runtime.table()  # virtual path -> expanded base, false if missing, error if broken
+
+    def expand(self, paths):
+        # Returns [(path, nxml.Element or None, problems or None)] in input order; problems next
+        # to an element are parser errors the file recovered from
+        lua_paths = core.lua_runtime.table_from(paths)
+        flats, errors = core.lua_nxml.expand_files(lua_paths, self.files.read, self.files.exists, self.cache)
+        results = []
+        for i, path in enumerate(paths, 1):
+            flat = flats[i]
+            elem = core.lua_to_element(flat) if flat is not None else None
+            results.append((path, elem, errors[i]))
+        return results
+
+    @property
+    def base_count(self):
+        # Base files actually expanded; the cache also remembers missing and broken ones
+        return sum(1 for _, base in self.cache.items() if base and not isinstance(base, str))
+
+    @property
+    def missing_bases(self):
+        return sorted(path for path, base in self.cache.items() if base is False)
+
+    @property
+    def broken_bases(self):
+        # {path: parse error} for base files that exist but could not be parsed
+        return {path: base for path, base in self.cache.items() if isinstance(base, str)}
+
+def sprite_refs(elem, found=None):
+    # Every sprite path the expanded entity tree points at
+    if found is None:
+        found = set()
+    for name in SPRITE_ATTRS:
+        value = elem.attr.get(name)
+        if value and value.lower().endswith(SPRITE_EXTENSIONS):
+            found.add(value.replace('\\', '/'))
+    for child in elem.children:
+        sprite_refs(child, found)
+    return found
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List every sprite referenced by the entities of a mod, with Base files expanded.")
+    parser.add_argument("mod_dir", help="the mod folder, e.g. mods/Noita40K")
+    parser.add_argument("--data", help="extracted game data root, so data/ bases and sprites resolve")
+    parser.add_argument("--json", action="store_true", help="print {sprite: [entities]} as JSON")
+    options = parser.parse_args(argv)
+
+    if core.LuaRuntime is None:
+        print("[Entities Error] expanding Base files needs lupa for nxml.lua", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    files = ModFiles(options.mod_dir, options.data)
+    paths = [files.virtual(path) for path in entity_files(options.mod_dir)]
+    expander = EntityExpander(files)
+    sprites = {}
+    failed = 0
+    for path, elem, error in expander.expand(paths):
+        if elem is None:
+            failed += 1
+            print(f"[Entities Error] {path}: {error}", file=sys.stderr)
+            continue
+        if error:
+            print(f"[Entities Warning] {path}: {error}", file=sys.stderr)
+        for sprite in sprite_refs(elem):
+            sprites.setdefault(sprite, []).append(path)
+
+    missing, broken = expander.missing_bases, expander.broken_bases
+    for path in missing:
+        print(f"[Entities Warning] base file not found: {path}", file=sys.stderr)
+    for path in sorted(broken):
+        print(f"[Entities Error] base file failed to parse: {broken[path]}", file=sys.stderr)
+
+    if options.json:
+        print(json.dumps({sprite: sprites[sprite] for sprite in sorted(sprites)}, indent=1))
+        return 0
+
+    for sprite in sorted(sprites):
+        state = "" if files.exists(sprite) else "  [missing]" if files.resolve(sprite) else "  [not in mod]"
+        print(f"{sprite}  ({len(sprites[sprite])} entities){state}")
+    print(f"{len(sprites)} sprites in {len(paths) - failed} entities ({failed} failed), "
+          f"{expander.base_count} base files parsed once, {len(missing)} missing, {len(broken)} broken, "
+          f"{time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
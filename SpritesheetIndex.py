@@ -0,0 +1,230 @@
+import json
+import os
+import posixpath
+import re
+import threading
+
+from SpritesheetCore import STAINS_SUFFIX
+
+# --- Constants ---
+PROJECT_INDEX_NAME = ".spritesheet_index.json"
+PROJECT_INDEX_VERSION = 1
+SKIPPED_DIRS = {"__pycache__", "node_modules"}
+XML_HEAD_BYTES = 4096  # The Sprite tag and its filename attributes sit at the top of the file
+OUTPUT_MARKER_NAME = ".spritesheet_output"  # Folders holding this file are tool output and are never indexed
+
+# (?<!\w) keeps hotspots_filename from matching as filename
+SPRITE_FILENAME_RE = re.compile(rb'(?<![\w])filename\s*=\s*"([^"]*)"')
+SPRITE_HOTSPOTS_RE = re.compile(rb'(?<![\w])hotspots_filename\s*=\s*"([^"]*)"')
+SPRITE_TAG_RE = re.compile(rb'<\s*Sprite\b')
+
+# --- Project Data Structure ---
+class Project:
+    def __init__(self, name, folder, png_path=None, xml_path=None, hotspots_path=None):
+        self.name = name
+        self.folder = folder
+        self.png_path = png_path
+        self.xml_path = xml_path
+        self.hotspots_path = hotspots_path
+
+def read_sprite_refs(xml_path):
+    # Returns {"sprite", "filename", "hotspots"} from the head of the file, without parsing it
+    try:
+        with open(xml_path, 'rb') as f:
+            head = f.read(XML_HEAD_BYTES)
+    except OSError:
+        head = b''
+    filename = SPRITE_FILENAME_RE.search(head)
+    hotspots = SPRITE_HOTSPOTS_RE.search(head)
+    return {
+        "sprite": SPRITE_TAG_RE.search(head) is not None,
+        "filename": filename.group(1).decode('utf-8', errors='replace') if filename else None,
+        "hotspots": hotspots.group(1).decode('utf-8', errors='replace') if hotspots else None,
+    }
+
+def scan_dir(full_path):
+    pngs, xmls, subdirs = [], {}, []
+    with os.scandir(full_path) as it:
+        for entry in it:
+            name = entry.name
+            if name == OUTPUT_MARKER_NAME:
+                return {"pngs": [], "xmls": {}, "subdirs": []}
+            if entry.is_dir(follow_symlinks=False):
+                if not name.startswith('.') and name not in SKIPPED_DIRS:
+                    subdirs.append(name)
+            elif name.lower().endswith('.png'):
+                pngs.append(name)
+            elif name.lower().endswith('.xml'):
+                st = entry.stat()
+                xmls[name] = dict(read_sprite_refs(entry.path), mtime=st.st_mtime_ns, size=st.st_size)
+    pngs.sort()
+    subdirs.sort()
+    return {"pngs": pngs, "xmls": xmls, "subdirs": subdirs}
+
+def refresh_xml_refs(full_path, xmls):
+    # The directory did not change, but an XML may have been edited in place
+    for name, ref in xmls.items():
+        xml_path = os.path.join(full_path, name)
+        try:
+            st = os.stat(xml_path)
+        except OSError:
+            continue
+        if st.st_mtime_ns != ref["mtime"] or st.st_size != ref["size"]:
+            ref.update(read_sprite_refs(xml_path), mtime=st.st_mtime_ns, size=st.st_size)
+
+def layer_path(full_path, filename, layer_ref):
+    # Sprite XMLs name their files by game path. The sheet named by `filename` is the one in
+    # this folder, so a layer sheet sits at the same relative position from here.
+    layer_ref = layer_ref.replace('\\', '/')
+    if filename:
+        rel = posixpath.relpath(layer_ref, posixpath.dirname(filename.replace('\\', '/')) or '.')
+    else:
+        rel = posixpath.basename(layer_ref)
+    return os.path.normpath(os.path.join(full_path, *rel.split('/')))
+
+def path_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+def pair_projects(rel, full_path, entry, layer_keys=frozenset()):
+    # Each sprite XML claims the PNG its filename attribute points at; leftovers pair by stem.
+    # PNGs in `layer_keys` (hotspot sheets of any project) are never projects of their own.
+    projects = []
+    pngs = {png.lower(): png for png in entry["pngs"]}
+    claimed = set()
+    unmatched_xmls = []
+    for xml_name in sorted(entry["xmls"]):
+        ref = entry["xmls"][xml_name]
+        if not ref["sprite"]:
+            continue
+        png = None
+        if ref["filename"]:
+            png = pngs.get(os.path.basename(ref["filename"].replace('\\', '/')).lower())
+        if png is None:
+            unmatched_xmls.append(xml_name)
+            continue
+        claimed.add(png)
+        projects.append((xml_name, png, ref))
+
+    for xml_name in unmatched_xmls:
+        png = pngs.get(os.path.splitext(xml_name)[0].lower() + '.png')
+        if png is not None and png in claimed:
+            png = None
+        if png is not None:
+            claimed.add(png)
+        projects.append((xml_name, png, entry["xmls"][xml_name]))
+
+    # Stain sheets sit next to the sheet they annotate
+    stains = set()
+    for png in entry["pngs"]:
+        stem, ext = os.path.splitext(png)
+        stains.add((stem + STAINS_SUFFIX + ext).lower())
+
+    for png in entry["pngs"]:
+        if png not in claimed and png.lower() not in stains and path_key(os.path.join(full_path, png)) not in layer_keys:
+            projects.append((None, png, None))
+
+    result = []
+    label = '' if rel == '.' else rel.replace(os.sep, '/')
+    single = len(projects) == 1
+    for xml_name, png, ref in projects:
+        stem = os.path.splitext(xml_name or png)[0]
+        name = label if single and label else (f"{label}/{stem}" if label else stem)
+        # The hotspot sheet may not exist yet; the editor creates it on the first save
+        hotspots_path = None
+        if ref and ref["hotspots"]:
+            hotspots_path = layer_path(full_path, ref["filename"], ref["hotspots"])
+        result.append(Project(
+            name, full_path,
+            os.path.join(full_path, png) if png else None,
+            os.path.join(full_path, xml_name) if xml_name else None,
+            hotspots_path,
+        ))
+    return result
+
+# --- Project Index ---
+class ProjectIndex:
+    def __init__(self, root='.'):
+        self.root = root
+        self.path = os.path.join(root, PROJECT_INDEX_NAME)
+        self.dirs = {}  # relative dir -> {"mtime", "pngs", "xmls", "subdirs"}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        try:
+            with open(self.path, 'r') as f:
+                store = json.load(f)
+            if store.get("version") == PROJECT_INDEX_VERSION:
+                self.dirs = store["dirs"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self.projects = self.collect_projects(self.dirs)
+
+    def collect_projects(self, dirs):
+        # Hotspot sheets often live in a shared folder above the sprites, so they are
+        # gathered over the whole tree before any folder is paired
+        layer_keys = set()
+        for rel, entry in dirs.items():
+            full_path = os.path.join(self.root, rel)
+            for ref in entry["xmls"].values():
+                if ref["sprite"] and ref["hotspots"]:
+                    layer_keys.add(path_key(layer_path(full_path, ref["filename"], ref["hotspots"])))
+        projects = []
+        for rel in sorted(dirs):
+            projects.extend(pair_projects(rel, os.path.join(self.root, rel), dirs[rel], layer_keys))
+        return projects
+
+    def scan(self, save=True):
+        dirs = {}
+        stack = ['.']
+        rescanned = 0
+        while stack:
+            rel = stack.pop()
+            full_path = os.path.normpath(os.path.join(self.root, rel))
+            try:
+                mtime = os.stat(full_path).st_mtime_ns
+            except OSError:
+                continue
+            entry = self.dirs.get(rel)
+            if entry is not None and entry["mtime"] == mtime:
+                refresh_xml_refs(full_path, entry["xmls"])
+            else:
+                try:
+                    entry = scan_dir(full_path)
+                except OSError:
+                    continue
+                entry["mtime"] = mtime
+                rescanned += 1
+            dirs[rel] = entry
+            stack.extend(os.path.join(rel, sub) if rel != '.' else sub for sub in entry["subdirs"])
+
+        projects = self.collect_projects(dirs)
+        with self.lock:
+            self.dirs = dirs
+            self.projects = projects
+        if save:
+            self.save()
+        print(f"[Index] {len(projects)} projects in {len(dirs)} folders, {rescanned} rescanned")
+        return projects
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": PROJECT_INDEX_VERSION, "dirs": self.dirs}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[Index Save Error] {e}")
+
+    def scan_in_background(self):
+        self.done.clear()
+
+        def run():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"[Index Error] {e}")
+            finally:
+                self.done.set()
+
+        thread = threading.Thread(target=run, name="ProjectIndex", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from SpritesheetCore import load_sheet, project_layers
+from SpritesheetProfile import profiler
+
+# --- Constants ---
+LOADER_WORKERS = 2
+PROJECT_CACHE_BUDGET = 256 * 1024 * 1024  # Bytes of sheet data kept for recently used projects
+
+# --- Loaded Project ---
+class LoadedProject:
+    # Everything the editor needs to switch to a project, built off the UI thread.
+    # Only the visual layer is decoded here; the others load when first shown.
+    def __init__(self, project, sheet, animations, stamp):
+        self.project = project
+        self.sheet = sheet
+        self.animations = animations
+        self.stamp = stamp
+        self.layers = []
+        if sheet is not None:
+            self.layers = project_layers(project.png_path, sheet, project.hotspots_path, project.xml_path)
+        self.cached_bytes = 0
+
+    @property
+    def nbytes(self):
+        sheets = [layer.sheet for layer in self.layers if layer.sheet is not None]
+        return sum(sheet.indices.nbytes + sheet.palette.nbytes for sheet in sheets)
+
+def file_stamp(*paths):
+    # (mtime, size) per file; a changed stamp means the cached copy is stale
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        stamp.append((st.st_mtime_ns, st.st_size) if st else None)
+    return tuple(stamp)
+
+def project_key(project):
+    return (project.png_path, project.xml_path)
+
+# --- Project Loader ---
+class ProjectLoader:
+    # Decodes sheets and parses animations on a thread pool. Finished loads stay in an
+    # LRU cache capped at `budget` bytes, so flipping back and forth is instant.
+    def __init__(self, animation_cache, budget=PROJECT_CACHE_BUDGET, workers=LOADER_WORKERS):
+        self.animation_cache = animation_cache
+        self.budget = budget
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ProjectLoader")
+        self.cache = OrderedDict()  # project key -> LoadedProject
+        self.pending = {}  # project key -> Future
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def request(self, project):
+        # Returns a Future resolving to a LoadedProject; cache hits resolve immediately
+        key = project_key(project)
+        with self.lock:
+            loaded = self.cache.get(key)
+            if loaded is not None:
+                if loaded.stamp == file_stamp(*key):
+                    self.cache.move_to_end(key)
+                    future = Future()
+                    future.set_result(loaded)
+                    return future
+                self.forget(key)
+            future = self.pending.get(key)
+            if future is None:
+                future = self.executor.submit(self.load, project)
+                self.pending[key] = future
+            return future
+
+    def prefetch(self, projects):
+        for project in projects:
+            if project is not None:
+                self.request(project)
+
+    @profiler.timed("load_project")
+    def load(self, project):
+        key = project_key(project)
+        try:
+            stamp = file_stamp(*key)
+            sheet = load_sheet(project.png_path) if project.png_path else None
+            animations = []
+            if project.xml_path:
+                animations = self.animation_cache.load(project.xml_path)
+                self.animation_cache.save()
+            loaded = LoadedProject(project, sheet, animations, stamp)
+            with self.lock:
+                self.remember(key, loaded)
+            return loaded
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def remember(self, key, loaded):
+        # Caller holds the lock
+        self.forget(key)
+        if loaded.nbytes > self.budget:
+            return
+        loaded.cached_bytes = loaded.nbytes
+        self.cache[key] = loaded
+        self.used += loaded.cached_bytes
+        while self.used > self.budget:
+            _, old = self.cache.popitem(last=False)
+            self.used -= old.cached_bytes
+
+    def forget(self, key):
+        # Caller holds the lock
+        old = self.cache.pop(key, None)
+        if old is not None:
+            self.used -= old.cached_bytes
+
+    def release(self, loaded):
+        # The editor hands the project back after saving it, so the stamp matches the file again
+        key = project_key(loaded.project)
+        loaded.stamp = file_stamp(*key)
+        with self.lock:
+            self.remember(key, loaded)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,85 @@
+import numpy as np
+
+# --- Lines ---
+def line_cells(x0, y0, x1, y1):
+    # (xs, ys) of the cells from (x0, y0) to (x1, y1), one per step along the longer axis,
+    # so consecutive cells always touch
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    if steps == 0:
+        return np.array([x0], dtype=np.int32), np.array([y0], dtype=np.int32)
+    t = np.arange(steps + 1, dtype=np.float64) / steps
+    xs = np.floor(x0 + (x1 - x0) * t + 0.5).astype(np.int32)
+    ys = np.floor(y0 + (y1 - y0) * t + 0.5).astype(np.int32)
+    return xs, ys
+
+# --- Flood Fill ---
+def row_runs(match):
+    # Every horizontal run of True as (row, start, end), ordered by row then start
+    h, w = match.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = match
+    steps = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
+    return rows, starts, ends
+
+def run_graph(rows, starts, ends, width):
+    # CSR adjacency between runs that touch across neighbouring rows (4-connected). Runs are
+    # keyed by row * (width + 1) + column, so one searchsorted finds the overlapping range
+    # in the next row for every run at once.
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    below = (rows + 1) * stride
+    lo = np.searchsorted(end_keys, below + starts, side='right')
+    hi = np.searchsorted(start_keys, below + ends, side='left')
+    counts = np.maximum(hi - lo, 0)
+
+    upper = np.repeat(np.arange(len(rows)), counts)
+    lower = expand_ranges(lo, counts)
+    src = np.concatenate((upper, lower))
+    dst = np.concatenate((lower, upper))
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(rows)), out=indptr[1:])
+    return indptr, dst[order], start_keys
+
+def expand_ranges(firsts, counts):
+    # Concatenation of range(first, first + count) for every pair, without a Python loop
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(firsts - offsets, counts) + np.arange(total)
+
+def flood_fill(indices, x, y):
+    # Boolean mask of the 4-connected region of indices[y, x]'s value. Works on runs instead
+    # of pixels: rows are cut into runs of the seed value, runs touching across rows are linked,
+    # and a breadth-first search walks the run graph a whole frontier at a time. Fragmented
+    # regions (dithering, noise) cost array passes, not a Python step per run.
+    h, w = indices.shape
+    match = indices == indices[y, x]
+    rows, starts, ends = row_runs(match)
+    indptr, neighbours, start_keys = run_graph(rows, starts, ends, w)
+
+    seed = np.searchsorted(start_keys, y * (w + 1) + x, side='right') - 1
+    reached = np.zeros(len(rows), dtype=bool)
+    reached[seed] = True
+    frontier = np.array([seed])
+    while frontier.size:
+        first = indptr[frontier]
+        step = neighbours[expand_ranges(first, indptr[frontier + 1] - first)]
+        frontier = np.unique(step[~reached[step]])
+        reached[frontier] = True
+
+    # Paint the reached runs through a +1/-1 edge array and a running sum per row
+    edges = np.zeros((h, w + 1), dtype=np.int8)
+    edges[rows[reached], starts[reached]] = 1
+    edges[rows[reached], ends[reached]] = -1
+    return np.cumsum(edges, axis=1, dtype=np.int8)[:, :w] > 0
+
+def mask_bounds(mask):
+    # (x, y, w, h) around the True cells of a non-empty mask
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    return int(xs[0]), int(ys[0]), int(xs[-1] - xs[0] + 1), int(ys[-1] - ys[0] + 1)
@@ -1,651 +1,849 @@
-import pygame
-import sys
-import os
-import copy
-from PIL import Image
-from lupa import LuaRuntime
-import time
-
-# --- Constants ---
-WINDOW_WIDTH, WINDOW_HEIGHT = 1200, 700
-PALETTE_HEIGHT = 50
-PIXEL_SIZE = 20
-DEFAULT_GRID_WIDTH = 32
-DEFAULT_GRID_HEIGHT = 32
-ZOOM_MIN, ZOOM_MAX = 0.01, 20
-SIDEBAR_WIDTH = 150
-ANIMATION_PANEL_WIDTH = 200
-FONT_SIZE = 16
-SMALL_FONT_SIZE = 12
-
-# --- Palette ---
-PALETTE = {}           # Maps index → RGBA
-PALETTE_REVERSE = {}   # Maps RGBA → index
-
-pygame.init()
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Pixel Art Editor with Animation Controls")
-font = pygame.font.SysFont(None, FONT_SIZE)
-small_font = pygame.font.SysFont(None, SMALL_FONT_SIZE)
-clock = pygame.time.Clock()
-
-# --- Grid State ---
-GRID_WIDTH, GRID_HEIGHT = DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT
-canvas = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-full_spritesheet = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-current_color = 1
-zoom = 1.0
-offset_x = SIDEBAR_WIDTH
-offset_y = 0
-drawing = False
-erasing = False
-is_panning = False
-pan_start = (0, 0)
-undo_stack = []
-redo_stack = []
-
-# --- Animation State ---
-animations = []
-current_animation_index = 0
-current_frame_index = 0
-is_playing = False
-last_frame_time = 0
-frame_duration = 0.2  # Default frame duration
-current_image_path = None
-current_xml_path = None
-
-# --- Lua Parser Setup ---
-lua = LuaRuntime(unpack_returned_tuples=True)
-with open("nxml.lua", "r") as f:
-    lua_code = "nxml = dofile( \"nxml.lua\" )"
-lua.execute(lua_code)
-nxml = lua.eval("nxml")
-parse_xml = nxml["parse"]
-
-# --- Project Data ---
-project_folders = []
-selected_project_index = None
-project_scroll = 0
-
-# --- Animation Data Structure ---
-class Animation:
-    def __init__(self, name, pos_x, pos_y, frame_width, frame_height, frame_count, frame_wait=0.2):
-        self.name = name
-        self.pos_x = pos_x
-        self.pos_y = pos_y
-        self.frame_width = frame_width
-        self.frame_height = frame_height
-        self.frame_count = frame_count
-        self.frame_wait = frame_wait
-
-# --- Functions ---
-def find_folders_with_pngs_and_xmls(base_dir='.'):
-    folders = []
-    for entry in os.listdir(base_dir):
-        full_path = os.path.join(base_dir, entry)
-        if os.path.isdir(full_path):
-            pngs = [f for f in os.listdir(full_path) if f.lower().endswith('.png')]
-            xmls = [f for f in os.listdir(full_path) if f.lower().endswith('.xml')]
-            if pngs or xmls:
-                folders.append((entry, full_path, pngs, xmls))
-    return folders
-
-def parse_animations(anim_data):
-    global animations
-    animations = []
-    
-    print(f"[DEBUG] Parsing animations from XML data: {anim_data}")
-    
-    if not anim_data:
-        print("[DEBUG] No animation data provided")
-        return
-    
-    # Check if anim_data has children attribute
-    if not hasattr(anim_data, 'children'):
-        print("[DEBUG] Animation data has no children attribute")
-        return
-    
-    print(f"[DEBUG] Found {len(anim_data.children)} children in XML")
-    
-    default_animation = None
-    if hasattr(anim_data, 'attr') and hasattr(anim_data.attr, 'default_animation'):
-        default_animation = anim_data.attr.default_animation
-    
-    print(f"[DEBUG] Default animation: {default_animation}")
-    
-    default_anim_data = None
-    
-    # Find default animation data first
-    for i, child in enumerate(anim_data.children):
-        print(f"[DEBUG] Child {i}: {child}")
-        if hasattr(child, 'name'):
-            print(f"[DEBUG] Child {i} name: {child.name}")
-            if child.name == "RectAnimation":
-                if hasattr(child, 'attr') and hasattr(child.attr, 'name'):
-                    print(f"[DEBUG] RectAnimation name: {child.attr.name}")
-                    if child.attr.name == default_animation:
-                        default_anim_data = child
-                        print(f"[DEBUG] Found default animation data")
-                        break
-    
-    if not default_anim_data:
-        print("[DEBUG] No default animation found, using first RectAnimation")
-        # If no default found, use first RectAnimation
-        for child in anim_data.children:
-            if hasattr(child, 'name') and child.name == "RectAnimation":
-                if hasattr(child, 'attr') and hasattr(child.attr, 'frame_width') and hasattr(child.attr, 'frame_height'):
-                    default_anim_data = child
-                    break
-    
-    if not default_anim_data:
-        print("[DEBUG] No suitable default animation found")
-        return
-    
-    # Get default frame dimensions
-    default_frame_width = int(default_anim_data.attr.frame_width)
-    default_frame_height = int(default_anim_data.attr.frame_height)
-    
-    print(f"[DEBUG] Default frame dimensions: {default_frame_width}x{default_frame_height}")
-    
-    # Parse all animations
-    for child in anim_data.children:
-        if hasattr(child, 'name') and child.name == "RectAnimation":
-            if not hasattr(child, 'attr'):
-                continue
-                
-            # Skip if it has a parent (child animation) or if it's metadata
-            if hasattr(child.attr, 'parent') or hasattr(child.attr, 'state'):
-                print(f"[DEBUG] Skipping child animation or metadata: {child.attr.name if hasattr(child.attr, 'name') else 'unknown'}")
-                continue
-            
-            if not hasattr(child.attr, 'name'):
-                print("[DEBUG] Skipping RectAnimation without name")
-                continue
-            
-            name = child.attr.name
-            pos_x = int(child.attr.pos_x) if hasattr(child.attr, 'pos_x') else 0
-            pos_y = int(child.attr.pos_y) if hasattr(child.attr, 'pos_y') else 0
-            frame_width = int(child.attr.frame_width) if hasattr(child.attr, 'frame_width') else default_frame_width
-            frame_height = int(child.attr.frame_height) if hasattr(child.attr, 'frame_height') else default_frame_height
-            frame_count = int(child.attr.frame_count) if hasattr(child.attr, 'frame_count') else 1
-            frame_wait = float(child.attr.frame_wait) if hasattr(child.attr, 'frame_wait') else 0.2
-            
-            print(f"[DEBUG] Adding animation: {name} at ({pos_x}, {pos_y}) {frame_width}x{frame_height} with {frame_count} frames")
-            animations.append(Animation(name, pos_x, pos_y, frame_width, frame_height, frame_count, frame_wait))
-    
-    print(f"[DEBUG] Total animations loaded: {len(animations)}")
-
-def load_image_from_path(path):
-    global canvas, full_spritesheet, GRID_WIDTH, GRID_HEIGHT, PALETTE, PALETTE_REVERSE, current_image_path
-    try:
-        current_image_path = path
-        img = Image.open(path).convert("RGBA")
-        w, h = img.size
-        GRID_WIDTH, GRID_HEIGHT = w, h
-        
-        # Store full spritesheet
-        full_spritesheet = [[0 for _ in range(w)] for _ in range(h)]
-        canvas = [[0 for _ in range(w)] for _ in range(h)]
-
-        # --- Generate palette from unique RGBA values ---
-        unique_colors = list({img.getpixel((x, y)) for y in range(h) for x in range(w)})
-        PALETTE.clear()
-        PALETTE_REVERSE.clear()
-
-        if (0, 0, 0, 0) in unique_colors:
-            PALETTE[0] = (0, 0, 0, 0)
-            unique_colors.remove((0, 0, 0, 0))
-            start_index = 1
-        else:
-            start_index = 0
-
-        for idx, color in enumerate(unique_colors, start=start_index):
-            PALETTE[idx] = color
-
-        for i, color in PALETTE.items():
-            PALETTE_REVERSE[color] = i
-
-        # --- Fill full spritesheet using new palette ---
-        for y in range(h):
-            for x in range(w):
-                rgba = img.getpixel((x, y))
-                full_spritesheet[y][x] = PALETTE_REVERSE.get(rgba, 0)
-
-        # Load current frame
-        load_current_frame()
-
-    except Exception as e:
-        print(f"[Image Load Error] {e}")
-
-def load_current_frame():
-    global canvas
-    if not animations or current_animation_index >= len(animations):
-        return
-    
-    anim = animations[current_animation_index]
-    frame_x = anim.pos_x + (current_frame_index * anim.frame_width)
-    frame_y = anim.pos_y
-    
-    # Clear canvas
-    canvas = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-    
-    # Copy current frame to canvas
-    for y in range(min(anim.frame_height, GRID_HEIGHT - frame_y)):
-        for x in range(min(anim.frame_width, GRID_WIDTH - frame_x)):
-            if frame_y + y < GRID_HEIGHT and frame_x + x < GRID_WIDTH:
-                canvas[y][x] = full_spritesheet[frame_y + y][frame_x + x]
-
-def save_current_frame():
-    if not animations or current_animation_index >= len(animations):
-        return
-    
-    anim = animations[current_animation_index]
-    frame_x = anim.pos_x + (current_frame_index * anim.frame_width)
-    frame_y = anim.pos_y
-    
-    # Save current frame back to full spritesheet
-    for y in range(min(anim.frame_height, len(canvas))):
-        for x in range(min(anim.frame_width, len(canvas[0]))):
-            if frame_y + y < GRID_HEIGHT and frame_x + x < GRID_WIDTH:
-                full_spritesheet[frame_y + y][frame_x + x] = canvas[y][x]
-
-def save_image():
-    if not current_image_path:
-        return
-    
-    try:
-        # Create PIL image from full spritesheet
-        img = Image.new("RGBA", (GRID_WIDTH, GRID_HEIGHT), (0, 0, 0, 0))
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                val = full_spritesheet[y][x]
-                color = PALETTE.get(val, (0, 0, 0, 0))
-                img.putpixel((x, y), color)
-        
-        img.save(current_image_path)
-        print(f"Saved image to {current_image_path}")
-    except Exception as e:
-        print(f"[Image Save Error] {e}")
-
-def save_state():
-    undo_stack.append(copy.deepcopy(canvas))
-    if len(undo_stack) > 100:
-        undo_stack.pop(0)
-    redo_stack.clear()
-
-def screen_to_grid(x, y):
-    gx = int((x - offset_x) / (PIXEL_SIZE * zoom))
-    gy = int((y - offset_y) / (PIXEL_SIZE * zoom))
-    return gx, gy
-
-def grid_to_screen(gx, gy):
-    x = gx * PIXEL_SIZE * zoom + offset_x
-    y = gy * PIXEL_SIZE * zoom + offset_y
-    return int(x), int(y)
-
-def draw_canvas():
-    # Draw the full spritesheet if no animations are loaded
-    if not animations:
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                val = canvas[y][x]
-                if val != 0:
-                    color = PALETTE.get(val, (0, 0, 0))
-                    sx, sy = grid_to_screen(x, y)
-                    size = int(PIXEL_SIZE * zoom)
-                    pygame.draw.rect(screen, color[:3], (sx, sy, size, size))
-        
-        # Draw full grid
-        for x in range(GRID_WIDTH + 1):
-            sx, _ = grid_to_screen(x, 0)
-            pygame.draw.line(screen, (40, 40, 40), (sx, 0), (sx, WINDOW_HEIGHT))
-        for y in range(GRID_HEIGHT + 1):
-            _, sy = grid_to_screen(0, y)
-            pygame.draw.line(screen, (40, 40, 40), (SIDEBAR_WIDTH, sy), (WINDOW_WIDTH, sy))
-        return
-    
-    # Draw current frame if animations are loaded
-    if current_animation_index >= len(animations):
-        return
-    
-    anim = animations[current_animation_index]
-    
-    for y in range(min(anim.frame_height, len(canvas))):
-        for x in range(min(anim.frame_width, len(canvas[0]))):
-            val = canvas[y][x]
-            if val != 0:
-                color = PALETTE.get(val, (0, 0, 0))
-                sx, sy = grid_to_screen(x, y)
-                size = int(PIXEL_SIZE * zoom)
-                pygame.draw.rect(screen, color[:3], (sx, sy, size, size))
-    
-    # Draw grid
-    for x in range(anim.frame_width + 1):
-        sx, _ = grid_to_screen(x, 0)
-        pygame.draw.line(screen, (40, 40, 40), (sx, offset_y), (sx, offset_y + anim.frame_height * PIXEL_SIZE * zoom))
-    
-    for y in range(anim.frame_height + 1):
-        _, sy = grid_to_screen(0, y)
-        pygame.draw.line(screen, (40, 40, 40), (offset_x, sy), (offset_x + anim.frame_width * PIXEL_SIZE * zoom, sy))
-
-def draw_palette():
-    pygame.draw.rect(screen, (30, 30, 30), (0, WINDOW_HEIGHT - PALETTE_HEIGHT, WINDOW_WIDTH, PALETTE_HEIGHT))
-    for idx, color in PALETTE.items():
-        x_pos = SIDEBAR_WIDTH + 10 + idx * 30
-        if x_pos < WINDOW_WIDTH - ANIMATION_PANEL_WIDTH - 30:
-            pygame.draw.rect(screen, color[:3], (x_pos, WINDOW_HEIGHT - 40, 25, 25))
-            if idx == current_color:
-                pygame.draw.rect(screen, (255, 255, 255), (x_pos, WINDOW_HEIGHT - 40, 25, 25), 2)
-
-def draw_sidebar():
-    pygame.draw.rect(screen, (50, 50, 50), (0, 0, SIDEBAR_WIDTH, WINDOW_HEIGHT))
-    y_offset = 10 - project_scroll
-    for i, (name, _, _, _) in enumerate(project_folders):
-        text = small_font.render(name, True, (255, 255, 255))
-        rect = text.get_rect(topleft=(10, y_offset))
-        screen.blit(text, rect)
-        if i == selected_project_index:
-            pygame.draw.rect(screen, (255, 255, 0), rect.inflate(4, 4), 2)
-        y_offset += SMALL_FONT_SIZE + 5
-
-def draw_animation_panel():
-    panel_x = WINDOW_WIDTH - ANIMATION_PANEL_WIDTH
-    pygame.draw.rect(screen, (40, 40, 40), (panel_x, 0, ANIMATION_PANEL_WIDTH, WINDOW_HEIGHT))
-    
-    y_offset = 10
-    
-    # Animation selector
-    text = font.render("Animations:", True, (255, 255, 255))
-    screen.blit(text, (panel_x + 10, y_offset))
-    y_offset += 25
-    
-    if not animations:
-        text = small_font.render("No animations loaded", True, (255, 100, 100))
-        screen.blit(text, (panel_x + 10, y_offset))
-        return
-    
-    for i, anim in enumerate(animations):
-        color = (255, 255, 0) if i == current_animation_index else (200, 200, 200)
-        text = small_font.render(f"{i}: {anim.name}", True, color)
-        screen.blit(text, (panel_x + 10, y_offset))
-        y_offset += 18
-    
-    y_offset += 20
-    
-    # Frame controls
-    if animations and current_animation_index < len(animations):
-        anim = animations[current_animation_index]
-        text = font.render("Frame Controls:", True, (255, 255, 255))
-        screen.blit(text, (panel_x + 10, y_offset))
-        y_offset += 25
-        
-        # Frame counter
-        text = small_font.render(f"Frame: {current_frame_index + 1}/{anim.frame_count}", True, (255, 255, 255))
-        screen.blit(text, (panel_x + 10, y_offset))
-        y_offset += 20
-        
-        # Frame navigation buttons
-        prev_btn = pygame.Rect(panel_x + 10, y_offset, 30, 20)
-        next_btn = pygame.Rect(panel_x + 50, y_offset, 30, 20)
-        
-        pygame.draw.rect(screen, (60, 60, 60), prev_btn)
-        pygame.draw.rect(screen, (60, 60, 60), next_btn)
-        
-        prev_text = small_font.render("<", True, (255, 255, 255))
-        next_text = small_font.render(">", True, (255, 255, 255))
-        
-        screen.blit(prev_text, (prev_btn.x + 10, prev_btn.y + 3))
-        screen.blit(next_text, (next_btn.x + 10, next_btn.y + 3))
-        
-        y_offset += 30
-        
-        # Play/Pause button
-        play_btn = pygame.Rect(panel_x + 10, y_offset, 70, 25)
-        pygame.draw.rect(screen, (60, 60, 60), play_btn)
-        play_text = small_font.render("Pause" if is_playing else "Play", True, (255, 255, 255))
-        screen.blit(play_text, (play_btn.x + 20, play_btn.y + 5))
-        
-        y_offset += 35
-        
-        # Animation info
-        info_text = small_font.render(f"Speed: {anim.frame_wait:.3f}s", True, (180, 180, 180))
-        screen.blit(info_text, (panel_x + 10, y_offset))
-        y_offset += 15
-        
-        info_text = small_font.render(f"Size: {anim.frame_width}x{anim.frame_height}", True, (180, 180, 180))
-        screen.blit(info_text, (panel_x + 10, y_offset))
-        y_offset += 15
-        
-        info_text = small_font.render(f"Pos: ({anim.pos_x}, {anim.pos_y})", True, (180, 180, 180))
-        screen.blit(info_text, (panel_x + 10, y_offset))
-
-def handle_sidebar_click(mx, my):
-    global selected_project_index, offset_x, offset_y, zoom, current_xml_path
-    y_offset = 10 - project_scroll
-    for i, (_, path, pngs, xmls) in enumerate(project_folders):
-        if y_offset <= my <= y_offset + SMALL_FONT_SIZE + 5:
-            selected_project_index = i
-            print(f"[DEBUG] Selected project: {path}")
-            if pngs:
-                print(f"[DEBUG] Loading image: {pngs[0]}")
-                load_image_from_path(os.path.join(path, pngs[0]))
-                offset_x = SIDEBAR_WIDTH
-                offset_y = 0
-                zoom = 1.0
-            if xmls:
-                current_xml_path = os.path.join(path, xmls[0])
-                print(f"[DEBUG] Loading XML: {current_xml_path}")
-                try:
-                    with open(current_xml_path, 'r') as f:
-                        xml_content = f.read()
-                    print(f"[DEBUG] XML content preview: {xml_content[:200]}...")
-                    anim_data = parse_xml(xml_content)
-                    print(f"[DEBUG] Parsed XML data: {anim_data}")
-                    parse_animations(anim_data)
-                    global current_animation_index, current_frame_index
-                    current_animation_index = 0
-                    current_frame_index = 0
-                    if animations:
-                        print(f"[DEBUG] Loading first animation: {animations[0].name}")
-                        load_current_frame()
-                    else:
-                        print("[DEBUG] No animations loaded!")
-                except Exception as e:
-                    print(f"[DEBUG] Error loading XML: {e}")
-                    import traceback
-                    traceback.print_exc()
-        y_offset += SMALL_FONT_SIZE + 5
-
-def handle_animation_panel_click(mx, my):
-    global current_animation_index, current_frame_index, is_playing
-    panel_x = WINDOW_WIDTH - ANIMATION_PANEL_WIDTH
-    
-    if mx < panel_x:
-        return
-    
-    # Check animation selection
-    y_offset = 35
-    for i, anim in enumerate(animations):
-        if y_offset <= my <= y_offset + 18:
-            if i != current_animation_index:
-                save_current_frame()
-                current_animation_index = i
-                current_frame_index = 0
-                load_current_frame()
-                save_image()
-            return
-        y_offset += 18
-    
-    # Check frame controls
-    if animations and current_animation_index < len(animations):
-        anim = animations[current_animation_index]
-        
-        # Frame navigation buttons
-        y_offset = 35 + len(animations) * 18 + 65
-        prev_btn = pygame.Rect(panel_x + 10, y_offset, 30, 20)
-        next_btn = pygame.Rect(panel_x + 50, y_offset, 30, 20)
-        
-        if prev_btn.collidepoint(mx, my):
-            if current_frame_index > 0:
-                save_current_frame()
-                current_frame_index -= 1
-                load_current_frame()
-                save_image()
-        elif next_btn.collidepoint(mx, my):
-            if current_frame_index < anim.frame_count - 1:
-                save_current_frame()
-                current_frame_index += 1
-                load_current_frame()
-                save_image()
-        
-        # Play/Pause button
-        y_offset += 30
-        play_btn = pygame.Rect(panel_x + 10, y_offset, 70, 25)
-        if play_btn.collidepoint(mx, my):
-            is_playing = not is_playing
-
-def update_animation():
-    global current_frame_index, last_frame_time
-    if not is_playing or not animations or current_animation_index >= len(animations):
-        return
-    
-    anim = animations[current_animation_index]
-    current_time = time.time()
-    
-    if current_time - last_frame_time >= anim.frame_wait:
-        save_current_frame()
-        current_frame_index = (current_frame_index + 1) % anim.frame_count
-        load_current_frame()
-        last_frame_time = current_time
-
-# --- Load Projects Once ---
-project_folders = find_folders_with_pngs_and_xmls()
-
-# --- Main Loop ---
-running = True
-while running:
-    screen.fill((20, 20, 20))
-    
-    # Update animation playback
-    update_animation()
-    
-    draw_sidebar()
-    draw_canvas()
-    draw_palette()
-    draw_animation_panel()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            mx, my = pygame.mouse.get_pos()
-            
-            if mx < SIDEBAR_WIDTH:
-                handle_sidebar_click(mx, my)
-            elif mx > WINDOW_WIDTH - ANIMATION_PANEL_WIDTH:
-                handle_animation_panel_click(mx, my)
-            elif my > WINDOW_HEIGHT - PALETTE_HEIGHT:
-                if event.button == 1:
-                    palette_idx = (mx - SIDEBAR_WIDTH - 10) // 30
-                    if palette_idx in PALETTE:
-                        current_color = palette_idx
-            else:
-                gx, gy = screen_to_grid(mx, my)
-                if animations and current_animation_index < len(animations):
-                    anim = animations[current_animation_index]
-                    if 0 <= gx < anim.frame_width and 0 <= gy < anim.frame_height:
-                        if event.button == 1:
-                            drawing = True
-                            if canvas[gy][gx] != current_color:
-                                save_state()
-                                canvas[gy][gx] = current_color
-                        elif event.button == 3:
-                            erasing = True
-                            if canvas[gy][gx] != 0:
-                                save_state()
-                                canvas[gy][gx] = 0
-                        elif event.button == 2:
-                            is_panning = True
-                            pan_start = (mx, my)
-                if event.button in (4, 5):
-                    old_zoom = zoom
-                    zoom_factor = 1.1 if event.button == 4 else 1 / 1.1
-                    zoom = max(ZOOM_MIN, min(ZOOM_MAX, zoom * zoom_factor))
-                    rel_x = (mx - offset_x) / old_zoom
-                    rel_y = (my - offset_y) / old_zoom
-                    offset_x = mx - rel_x * zoom
-                    offset_y = my - rel_y * zoom
-
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                drawing = False
-                if drawing:
-                    save_current_frame()
-                    save_image()
-            elif event.button == 3:
-                erasing = False
-                if erasing:
-                    save_current_frame()
-                    save_image()
-            elif event.button == 2:
-                is_panning = False
-
-        elif event.type == pygame.MOUSEMOTION:
-            mx, my = event.pos
-            if drawing and animations and current_animation_index < len(animations):
-                anim = animations[current_animation_index]
-                gx, gy = screen_to_grid(mx, my)
-                if 0 <= gx < anim.frame_width and 0 <= gy < anim.frame_height:
-                    if canvas[gy][gx] != current_color:
-                        canvas[gy][gx] = current_color
-            elif erasing and animations and current_animation_index < len(animations):
-                anim = animations[current_animation_index]
-                gx, gy = screen_to_grid(mx, my)
-                if 0 <= gx < anim.frame_width and 0 <= gy < anim.frame_height:
-                    if canvas[gy][gx] != 0:
-                        canvas[gy][gx] = 0
-            elif is_panning:
-                dx = mx - pan_start[0]
-                dy = my - pan_start[1]
-                offset_x += dx
-                offset_y += dy
-                pan_start = (mx, my)
-
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_z and pygame.key.get_mods() & pygame.KMOD_CTRL:
-                if undo_stack:
-                    redo_stack.append(copy.deepcopy(canvas))
-                    canvas = undo_stack.pop()
-                    save_current_frame()
-                    save_image()
-            elif event.key == pygame.K_y and pygame.key.get_mods() & pygame.KMOD_CTRL:
-                if redo_stack:
-                    undo_stack.append(copy.deepcopy(canvas))
-                    canvas = redo_stack.pop()
-                    save_current_frame()
-                    save_image()
-            elif event.key == pygame.K_SPACE:
-                is_playing = not is_playing
-            elif event.key == pygame.K_LEFT:
-                if animations and current_animation_index < len(animations):
-                    anim = animations[current_animation_index]
-                    if current_frame_index > 0:
-                        save_current_frame()
-                        current_frame_index -= 1
-                        load_current_frame()
-                        save_image()
-            elif event.key == pygame.K_RIGHT:
-                if animations and current_animation_index < len(animations):
-                    anim = animations[current_animation_index]
-                    if current_frame_index < anim.frame_count - 1:
-                        save_current_frame()
-                        current_frame_index += 1
-                        load_current_frame()
-                        save_image()
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+import pygame
+import logging
+import os
+import sys
+import numpy as np
+import time
+from SpritesheetCore import (
+    UndoHistory, AnimationCache, FrameTable,
+    frame_rect, frame_stack, extract_rect, store_rect,
+)
+from SpritesheetRender import FrameRenderer
+from SpritesheetPaint import line_cells, flood_fill, mask_bounds
+from SpritesheetIndex import ProjectIndex
+from SpritesheetLoader import ProjectLoader, PROJECT_CACHE_BUDGET, file_stamp, project_key
+from SpritesheetProfile import profiler
+from SpritesheetAutosave import Autosaver
+
+# --- Constants ---
+WINDOW_WIDTH, WINDOW_HEIGHT = 1200, 700
+PALETTE_HEIGHT = 50
+PIXEL_SIZE = 20
+DEFAULT_GRID_WIDTH = 32
+DEFAULT_GRID_HEIGHT = 32
+ZOOM_MIN, ZOOM_MAX = 0.01, 20
+SIDEBAR_WIDTH = 150
+ANIMATION_PANEL_WIDTH = 200
+FONT_SIZE = 16
+SMALL_FONT_SIZE = 12
+SAVE_PALETTED = False  # Write mode "P" PNGs when the palette fits in 256 colors
+ONION_FRAMES = 2              # Neighbouring frames shown on each side in onion-skin mode
+ONION_ALPHA = 0.35            # Opacity of the nearest onion frame, fading out with distance
+ONION_REFERENCE_ALPHA = 0.25  # Opacity of the default animation's frame when shown as reference
+PROFILE_TRACE_PATH = "spritesheet_trace.json"  # Chrome trace written on exit when profiling ran
+FRAME_WAIT_STEP = 0.01  # Seconds added or removed per [ / ] press
+
+# --- Palette ---
+PALETTE = {}           # Maps index → RGBA
+PALETTE_REVERSE = {}   # Maps RGBA → index
+
+# --- Diagnostics ---
+# SPRITESHEET_LOG=debug shows parser and loader chatter; SPRITESHEET_PROFILE=1 (or F3) starts the profiler
+LOG_LEVEL = os.environ.get("SPRITESHEET_LOG", "WARNING").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    print(f"[Log Warning] unknown SPRITESHEET_LOG level {LOG_LEVEL!r}, using WARNING")
+    LOG_LEVEL = "WARNING"
+logging.basicConfig(level=LOG_LEVEL, format="[%(levelname)s] %(message)s")
+log = logging.getLogger("spritesheet")
+profiler.enabled = os.environ.get("SPRITESHEET_PROFILE") == "1"
+
+pygame.init()
+screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+pygame.display.set_caption("Pixel Art Editor with Animation Controls")
+font = pygame.font.SysFont(None, FONT_SIZE)
+small_font = pygame.font.SysFont(None, SMALL_FONT_SIZE)
+clock = pygame.time.Clock()
+frame_renderer = FrameRenderer(PIXEL_SIZE)
+
+# --- Grid State ---
+GRID_WIDTH, GRID_HEIGHT = DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT
+sheet = None
+full_spritesheet = np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+canvas = full_spritesheet
+current_color = 1
+zoom = 1.0
+offset_x = SIDEBAR_WIDTH
+offset_y = 0
+drawing = False
+erasing = False
+tool = "pencil"     # pencil, line or fill
+stroke_cell = None  # Last cell of the pencil stroke, so fast mouse moves are joined up
+line_start = None   # Anchor of the line being dragged out, None when no line is pending
+line_end = None
+line_color = 0
+is_panning = False
+pan_start = (0, 0)
+
+# --- Animation State ---
+animations = []
+frame_table = FrameTable([])  # (animation, frame, x, y, w, h) per frame, rebuilt when animations change
+frame_stacks = []  # Per animation: (frames, h, w) view into the sheet, or None to fall back to copies
+layers = []        # Layer per plane (visual, hotspots, stains); only visual is read up front
+layer_index = 0
+layer_renderers = []
+layer_stacks = {}  # layer -> frame_stacks, built the first time the layer is shown
+current_animation_index = 0
+current_frame_index = 0
+is_playing = False
+last_frame_time = 0
+frame_duration = 0.2  # Default frame duration
+current_image_path = None
+current_xml_path = None
+history = UndoHistory()
+autosaver = Autosaver()
+onion_skin = False
+onion_reference = False
+
+# --- Project Data ---
+project_folders = []
+selected_project_index = None
+project_scroll = 0
+active_project = None  # LoadedProject being edited
+pending_load = None    # Future for the project being loaded
+
+# --- Functions ---
+@profiler.timed()
+def activate_project(loaded):
+    global full_spritesheet, sheet, GRID_WIDTH, GRID_HEIGHT, current_xml_path
+    global animations, layers, layer_index, layer_renderers, layer_stacks, current_animation_index, current_frame_index
+    global active_project, offset_x, offset_y, zoom, frame_table
+    active_project = loaded
+    current_xml_path = loaded.project.xml_path
+    animations = loaded.animations
+    frame_table = FrameTable(animations)
+    current_animation_index = 0
+    current_frame_index = 0
+    history.clear()
+    if current_xml_path and not animations:
+        log.debug("No animations loaded!")
+
+    # Every layer keeps its own renderer cache and frame views
+    layers = loaded.layers
+    layer_renderers = [FrameRenderer(PIXEL_SIZE) for _ in layers]
+    layer_stacks = {}
+    layer_index = 0
+    sheet = None
+    if layers:
+        offset_x = SIDEBAR_WIDTH
+        offset_y = 0
+        zoom = 1.0
+        show_layer(0)
+    else:
+        GRID_WIDTH, GRID_HEIGHT = DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT
+        full_spritesheet = np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        PALETTE.clear()
+        PALETTE_REVERSE.clear()
+        load_current_frame()
+
+def show_layer(i):
+    global layer_index, sheet, full_spritesheet, frame_stacks, frame_renderer, current_image_path, GRID_WIDTH, GRID_HEIGHT
+    global current_color
+    layer = layers[i]
+    layer_index = i
+    sheet = layer.load(layers[0].sheet)
+    current_image_path = layer.path
+    GRID_WIDTH, GRID_HEIGHT = sheet.width, sheet.height
+    full_spritesheet = sheet.indices
+    frame_renderer = layer_renderers[i]
+    if i not in layer_stacks:
+        layer_stacks[i] = [frame_stack(sheet, anim) for anim in animations]
+    frame_stacks = layer_stacks[i]
+
+    # --- Palette lookup for the UI ---
+    PALETTE.clear()
+    PALETTE_REVERSE.clear()
+    for index, color in enumerate(map(tuple, sheet.palette.tolist())):
+        PALETTE[index] = color
+        PALETTE_REVERSE[color] = index
+    # Layers and projects differ in palette size; keep the brush inside the one now shown
+    if current_color not in PALETTE:
+        current_color = min(1, len(PALETTE) - 1)
+
+    load_current_frame()
+
+def switch_layer(i):
+    # Flush the layer being left; untouched layers are never written
+    if i == layer_index or not layers:
+        return
+    save_current_frame()
+    save_image()
+    show_layer(i)
+
+def deactivate_project():
+    # Flush the open project and hand it back to the loader cache for instant return
+    global active_project
+    if active_project is None:
+        return
+    save_current_frame()
+    save_image()
+    autosaver.flush()  # The loader stamps the files, so they must be written first
+    project_loader.release(active_project)
+    active_project = None
+
+@profiler.timed()
+def load_current_frame():
+    global canvas
+    if sheet is None or not animations or current_animation_index >= len(animations):
+        canvas = full_spritesheet
+        return
+    
+    stack = frame_stacks[current_animation_index]
+    if stack is not None:
+        canvas = stack[current_frame_index]
+    else:
+        canvas = extract_rect(sheet, frame_table.rect(current_animation_index, current_frame_index))
+
+def layer_frame(layer, animation, frame):
+    stack = layer_stacks[layer][animation]
+    if stack is not None:
+        return stack[frame]
+    return extract_rect(layers[layer].sheet, frame_table.rect(animation, frame))
+
+def frame_indices(animation, frame):
+    return layer_frame(layer_index, animation, frame)
+
+def onion_ghosts():
+    # (key, indices, alpha) for the frames drawn under the current one, farthest first
+    ghosts = []
+    if onion_reference:
+        ref = next((i for i, a in enumerate(animations) if a.is_default), 0)
+        if ref != current_animation_index:
+            frame = min(current_frame_index, animations[ref].frame_count - 1)
+            ghosts.append(((ref, frame), frame_indices(ref, frame), ONION_REFERENCE_ALPHA))
+    if onion_skin:
+        anim = animations[current_animation_index]
+        for distance in range(ONION_FRAMES, 0, -1):
+            alpha = ONION_ALPHA * (ONION_FRAMES - distance + 1) / ONION_FRAMES
+            for frame in (current_frame_index - distance, current_frame_index + distance):
+                if 0 <= frame < anim.frame_count:
+                    ghosts.append(((current_animation_index, frame), frame_indices(current_animation_index, frame), alpha))
+    return ghosts
+
+def mark_dirty(gx, gy, w=1, h=1):
+    frame_renderer.invalidate(current_animation_index, current_frame_index)
+    if sheet is None or not animations or current_animation_index >= len(animations):
+        return
+    frame_x, frame_y = frame_table.rect(current_animation_index, current_frame_index)[:2]
+    sheet.mark_dirty(frame_x + gx, frame_y + gy, w, h)
+
+@profiler.timed()
+def save_current_frame():
+    if sheet is None or not animations or current_animation_index >= len(animations):
+        return
+    
+    store_rect(sheet, frame_table.rect(current_animation_index, current_frame_index), canvas)
+
+@profiler.timed()
+def save_image(final=False):
+    # Hands a snapshot to the autosaver; an explicit (final) save is written at full compression
+    if not current_image_path or sheet is None:
+        return
+    if sheet.unsaved is None and not final:
+        return
+    
+    autosaver.request(sheet, current_image_path, SAVE_PALETTED, final)
+
+def inherits_from(anim, name):
+    by_name = {other.name: other for other in animations}
+    seen = set()
+    while anim.parent and anim.parent not in seen:
+        if anim.parent == name:
+            return True
+        seen.add(anim.parent)
+        anim = by_name.get(anim.parent, anim)
+    return False
+
+def edit_animation(frame_wait_delta=0.0, frame_count_delta=0):
+    # Metadata edits go to the XML through the autosaver, patched in place
+    global current_frame_index, frame_table
+    if not animations or current_animation_index >= len(animations) or not current_xml_path:
+        return
+    anim = animations[current_animation_index]
+    frame_wait = round(max(FRAME_WAIT_STEP, anim.frame_wait + frame_wait_delta), 3)
+    frame_count = max(1, anim.frame_count + frame_count_delta)
+    if frame_count > anim.frame_count and sheet is not None:
+        x, y, w, h = frame_rect(anim, frame_count - 1)
+        if x + w > sheet.width or y + h > sheet.height:
+            return
+    if (frame_wait, frame_count) == (anim.frame_wait, anim.frame_count):
+        return
+
+    # Children still inheriting the old value follow the edit, as they will when the XML is read again
+    old_wait, old_count = anim.frame_wait, anim.frame_count
+    family = [i for i, other in enumerate(animations) if other is anim or inherits_from(other, anim.name)]
+    resized = []
+    for i in family:
+        other = animations[i]
+        if other.frame_wait == old_wait:
+            other.frame_wait = frame_wait
+        if other.frame_count == old_count and frame_count != old_count:
+            other.frame_count = frame_count
+            resized.append(i)
+
+    if resized:
+        save_current_frame()
+        frame_table = FrameTable(animations)
+        for layer, stacks in layer_stacks.items():
+            for i in resized:
+                stacks[i] = frame_stack(layers[layer].sheet, animations[i])
+        for renderer in layer_renderers:
+            renderer.invalidate()
+        current_frame_index = min(current_frame_index, anim.frame_count - 1)
+        load_current_frame()
+    autosaver.request_animations(current_xml_path, animations)
+
+def color_in_palette(color):
+    return sheet is not None and 0 <= color < len(sheet.palette)
+
+def paint_cells(xs, ys, color, patch=False):
+    # Sets a batch of cells at once: clipped to the frame, recorded into the open stroke (or as one
+    # patch of its own), and marked dirty as a single rect
+    if not color_in_palette(color):
+        return
+    h, w = canvas.shape
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    xs, ys = xs[inside], ys[inside]
+    old = canvas[ys, xs]
+    changed = old != color
+    xs, ys, old = xs[changed], ys[changed], old[changed]
+    if len(xs) == 0:
+        return
+    where = (layer_index, current_animation_index, current_frame_index)
+    if patch:
+        history.record_patch(where, xs, ys, old, color)
+    else:
+        history.record_cells(where, xs, ys, old, color)
+    canvas[ys, xs] = color
+    x0, y0 = int(xs.min()), int(ys.min())
+    mark_dirty(x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1)
+
+def paint_stroke(gx, gy, color):
+    # Pencil: joins the cell to the previous one, so no gaps open up between motion events
+    global stroke_cell
+    x0, y0 = stroke_cell if stroke_cell is not None else (gx, gy)
+    paint_cells(*line_cells(x0, y0, gx, gy), color)
+    stroke_cell = (gx, gy)
+
+def fill_at(gx, gy, color):
+    old = int(canvas[gy, gx])
+    if old == color or not color_in_palette(color):
+        return
+    mask = flood_fill(canvas, gx, gy)
+    ys, xs = np.nonzero(mask)
+    # Every filled cell had the same old value, so the patch stores it once
+    history.record_patch((layer_index, current_animation_index, current_frame_index), xs, ys, old, color)
+    canvas[mask] = color
+    mark_dirty(*mask_bounds(mask))
+
+def finish_line():
+    global line_start
+    xs, ys = line_cells(*line_start, *line_end)
+    line_start = None
+    paint_cells(xs, ys, line_color, patch=True)
+    save_current_frame()
+    save_image()
+
+def apply_patch(patch, values):
+    global current_animation_index, current_frame_index
+    if patch.layer >= len(layers):
+        return
+    if patch.animation >= len(animations) or patch.frame >= animations[patch.animation].frame_count:
+        return
+    
+    # Jump back to the layer and frame the patch was painted on
+    switch_layer(patch.layer)
+    if (patch.animation, patch.frame) != (current_animation_index, current_frame_index):
+        save_current_frame()
+        current_animation_index = patch.animation
+        current_frame_index = patch.frame
+        load_current_frame()
+    
+    canvas[patch.ys, patch.xs] = values
+    x0, y0 = int(patch.xs.min()), int(patch.ys.min())
+    mark_dirty(x0, y0, int(patch.xs.max()) - x0 + 1, int(patch.ys.max()) - y0 + 1)
+
+def screen_to_grid(x, y):
+    gx = int((x - offset_x) / (PIXEL_SIZE * zoom))
+    gy = int((y - offset_y) / (PIXEL_SIZE * zoom))
+    return gx, gy
+
+def grid_to_screen(gx, gy):
+    x = gx * PIXEL_SIZE * zoom + offset_x
+    y = gy * PIXEL_SIZE * zoom + offset_y
+    return int(x), int(y)
+
+def draw_canvas():
+    if sheet is None:
+        return
+    
+    # Draw the full spritesheet if no animations are loaded
+    ghosts = None
+    if not animations:
+        key = (None, None)
+    elif current_animation_index < len(animations):
+        key = (current_animation_index, current_frame_index)
+        if onion_skin or onion_reference:
+            ghosts = onion_ghosts
+    else:
+        return
+    
+    screen.set_clip(pygame.Rect(SIDEBAR_WIDTH, 0, WINDOW_WIDTH - SIDEBAR_WIDTH - ANIMATION_PANEL_WIDTH, WINDOW_HEIGHT - PALETTE_HEIGHT))
+    if layer_index != 0:
+        # Other layers are painted over the visual frame they annotate
+        visual = layers[0].sheet
+        indices = visual.indices if key == (None, None) else layer_frame(0, *key)
+        layer_renderers[0].draw(screen, key, indices, visual.palette, zoom, (offset_x, offset_y))
+    frame_renderer.draw(screen, key, canvas, sheet.palette, zoom, (offset_x, offset_y), ghosts)
+    if line_start is not None and key != (None, None):
+        draw_line_preview()
+    screen.set_clip(None)
+
+def draw_line_preview():
+    # The cells the line tool will set, shown until the button is released; erasing draws outlines
+    h, w = canvas.shape
+    xs, ys = line_cells(*line_start, *line_end)
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    size = max(1, int(PIXEL_SIZE * zoom))
+    if line_color:
+        color, width = tuple(int(c) for c in sheet.palette[line_color][:3]), 0
+    else:
+        color, width = (255, 255, 255), 1
+    for x, y in zip(xs[inside].tolist(), ys[inside].tolist()):
+        pygame.draw.rect(screen, color, (*grid_to_screen(x, y), size, size), width)
+
+def draw_profiler_hud():
+    if not profiler.enabled:
+        return
+    rows = profiler.percentiles()
+    x, y = SIDEBAR_WIDTH + 10, 30
+    hud = pygame.Surface((260, 16 + 14 * len(rows)), pygame.SRCALPHA, 32)
+    hud.fill((0, 0, 0, 170))
+    screen.blit(hud, (x - 5, y - 5))
+    screen.blit(small_font.render("phase                p50 ms   p99 ms", True, (255, 255, 0)), (x, y))
+    for name, p50, p99, _ in rows:
+        y += 14
+        color = (255, 120, 120) if p99 > 16.0 else (220, 220, 220)
+        screen.blit(small_font.render(f"{name[:20]:20} {p50:7.2f} {p99:8.2f}", True, color), (x, y))
+
+def draw_palette():
+    pygame.draw.rect(screen, (30, 30, 30), (0, WINDOW_HEIGHT - PALETTE_HEIGHT, WINDOW_WIDTH, PALETTE_HEIGHT))
+    for idx, color in PALETTE.items():
+        x_pos = SIDEBAR_WIDTH + 10 + idx * 30
+        if x_pos < WINDOW_WIDTH - ANIMATION_PANEL_WIDTH - 30:
+            pygame.draw.rect(screen, color[:3], (x_pos, WINDOW_HEIGHT - 40, 25, 25))
+            if idx == current_color:
+                pygame.draw.rect(screen, (255, 255, 255), (x_pos, WINDOW_HEIGHT - 40, 25, 25), 2)
+
+def draw_sidebar():
+    pygame.draw.rect(screen, (50, 50, 50), (0, 0, SIDEBAR_WIDTH, WINDOW_HEIGHT))
+    y_offset = 10 - project_scroll
+    for i, project in enumerate(project_folders):
+        text = small_font.render(project.name, True, (255, 255, 255))
+        rect = text.get_rect(topleft=(10, y_offset))
+        screen.blit(text, rect)
+        if i == selected_project_index:
+            pygame.draw.rect(screen, (255, 255, 0), rect.inflate(4, 4), 2)
+        y_offset += SMALL_FONT_SIZE + 5
+
+def draw_animation_panel():
+    panel_x = WINDOW_WIDTH - ANIMATION_PANEL_WIDTH
+    pygame.draw.rect(screen, (40, 40, 40), (panel_x, 0, ANIMATION_PANEL_WIDTH, WINDOW_HEIGHT))
+    
+    y_offset = 10
+    
+    # Animation selector
+    text = font.render("Animations:", True, (255, 255, 255))
+    screen.blit(text, (panel_x + 10, y_offset))
+    y_offset += 25
+    
+    if not animations:
+        text = small_font.render("No animations loaded", True, (255, 100, 100))
+        screen.blit(text, (panel_x + 10, y_offset))
+        return
+    
+    for i in panel_animations():
+        anim = animations[i]
+        color = (255, 255, 0) if i == current_animation_index else (200, 200, 200)
+        text = small_font.render(f"{i}: {anim.name}", True, color)
+        screen.blit(text, (panel_x + 10, y_offset))
+        y_offset += 18
+    
+    y_offset += 20
+    
+    # Frame controls
+    if animations and current_animation_index < len(animations):
+        anim = animations[current_animation_index]
+        text = font.render("Frame Controls:", True, (255, 255, 255))
+        screen.blit(text, (panel_x + 10, y_offset))
+        y_offset += 25
+        
+        # Frame counter
+        text = small_font.render(f"Frame: {current_frame_index + 1}/{anim.frame_count}", True, (255, 255, 255))
+        screen.blit(text, (panel_x + 10, y_offset))
+        y_offset += 20
+        
+        # Frame navigation buttons
+        prev_btn = pygame.Rect(panel_x + 10, y_offset, 30, 20)
+        next_btn = pygame.Rect(panel_x + 50, y_offset, 30, 20)
+        
+        pygame.draw.rect(screen, (60, 60, 60), prev_btn)
+        pygame.draw.rect(screen, (60, 60, 60), next_btn)
+        
+        prev_text = small_font.render("<", True, (255, 255, 255))
+        next_text = small_font.render(">", True, (255, 255, 255))
+        
+        screen.blit(prev_text, (prev_btn.x + 10, prev_btn.y + 3))
+        screen.blit(next_text, (next_btn.x + 10, next_btn.y + 3))
+        
+        y_offset += 30
+        
+        # Play/Pause button
+        play_btn = pygame.Rect(panel_x + 10, y_offset, 70, 25)
+        pygame.draw.rect(screen, (60, 60, 60), play_btn)
+        play_text = small_font.render("Pause" if is_playing else "Play", True, (255, 255, 255))
+        screen.blit(play_text, (play_btn.x + 20, play_btn.y + 5))
+        
+        y_offset += 35
+        
+        # Animation info
+        info_text = small_font.render(f"Speed: {anim.frame_wait:.3f}s  ([ ] speed, - = frames)", True, (180, 180, 180))
+        screen.blit(info_text, (panel_x + 10, y_offset))
+        y_offset += 15
+        
+        info_text = small_font.render(f"Size: {anim.frame_width}x{anim.frame_height}", True, (180, 180, 180))
+        screen.blit(info_text, (panel_x + 10, y_offset))
+        y_offset += 15
+        
+        info_text = small_font.render(f"Pos: ({anim.pos_x}, {anim.pos_y})", True, (180, 180, 180))
+        screen.blit(info_text, (panel_x + 10, y_offset))
+        y_offset += 15
+        
+        info_text = small_font.render(f"Tool (B/U/G): {tool}", True, (180, 180, 180))
+        screen.blit(info_text, (panel_x + 10, y_offset))
+        y_offset += 15
+        
+        info_text = small_font.render(f"Onion (O): {'on' if onion_skin else 'off'}  Ref (R): {'on' if onion_reference else 'off'}", True, (180, 180, 180))
+        screen.blit(info_text, (panel_x + 10, y_offset))
+        y_offset += 15
+        
+        if layers:
+            info_text = small_font.render(f"Layer (L): {layers[layer_index].name}", True, (180, 180, 180))
+            screen.blit(info_text, (panel_x + 10, y_offset))
+
+def handle_sidebar_click(mx, my):
+    y_offset = 10 - project_scroll
+    for i, project in enumerate(project_folders):
+        if y_offset <= my <= y_offset + SMALL_FONT_SIZE + 5:
+            select_project(i)
+        y_offset += SMALL_FONT_SIZE + 5
+
+def select_project(i):
+    global selected_project_index, pending_load
+    selected_project_index = i
+    project = project_folders[i]
+    log.debug("Selected project: %s", project.folder)
+    if active_project is not None and project_key(active_project.project) == project_key(project):
+        pending_load = None  # Already open; the copy on screen is newer than anything on disk
+        return
+    if active_project is not None:
+        # Land pending writes and restamp the open project first, so the loader never
+        # mistakes our own autosave for an outside edit and reads a stale copy back
+        autosaver.flush()
+        project_loader.release(active_project)
+    pending_load = project_loader.request(project)
+
+    # Warm the neighbours so stepping through the list does not wait on the disk
+    project_loader.prefetch(project_folders[j] for j in (i - 1, i + 1) if 0 <= j < len(project_folders))
+
+def poll_project_load():
+    global pending_load
+    if pending_load is None or not pending_load.done():
+        return
+    future, pending_load = pending_load, None
+    try:
+        loaded = future.result()
+    except Exception as e:
+        print(f"[Project Load Error] {e}")
+        return
+    if loaded.stamp != file_stamp(*project_key(loaded.project)):
+        # Read before a write to its files landed; fetch it again rather than show the old pixels
+        pending_load = project_loader.request(loaded.project)
+        return
+    deactivate_project()
+    activate_project(loaded)
+
+def draw_loading():
+    if pending_load is None:
+        return
+    dots = "." * (int(time.time() * 4) % 4)
+    text = font.render(f"Loading{dots}", True, (255, 255, 255))
+    screen.blit(text, (SIDEBAR_WIDTH + 10, 10))
+
+def refresh_projects():
+    global project_folders, selected_project_index
+    if project_folders is project_index.projects:
+        return
+    
+    # The background scan finished; keep the selection on the same project
+    selected = None
+    if selected_project_index is not None and selected_project_index < len(project_folders):
+        selected = project_folders[selected_project_index].name
+    project_folders = project_index.projects
+    selected_project_index = next((i for i, p in enumerate(project_folders) if p.name == selected), None)
+
+def panel_animations():
+    # Inherited animations share their parent's frames, so the panel lists only the ones with
+    # their own rows; the current animation is listed even if it inherits
+    return [i for i, anim in enumerate(animations) if anim.parent is None or i == current_animation_index]
+
+def handle_animation_panel_click(mx, my):
+    global current_animation_index, current_frame_index, is_playing
+    panel_x = WINDOW_WIDTH - ANIMATION_PANEL_WIDTH
+    
+    if mx < panel_x:
+        return
+    
+    # Check animation selection
+    y_offset = 35
+    rows = panel_animations()
+    for i in rows:
+        if y_offset <= my <= y_offset + 18:
+            if i != current_animation_index:
+                save_current_frame()
+                current_animation_index = i
+                current_frame_index = 0
+                load_current_frame()
+                save_image()
+            return
+        y_offset += 18
+    
+    # Check frame controls
+    if animations and current_animation_index < len(animations):
+        anim = animations[current_animation_index]
+        
+        # Frame navigation buttons
+        y_offset = 35 + len(rows) * 18 + 65
+        prev_btn = pygame.Rect(panel_x + 10, y_offset, 30, 20)
+        next_btn = pygame.Rect(panel_x + 50, y_offset, 30, 20)
+        
+        if prev_btn.collidepoint(mx, my):
+            if current_frame_index > 0:
+                save_current_frame()
+                current_frame_index -= 1
+                load_current_frame()
+                save_image()
+        elif next_btn.collidepoint(mx, my):
+            if current_frame_index < anim.frame_count - 1:
+                save_current_frame()
+                current_frame_index += 1
+                load_current_frame()
+                save_image()
+        
+        # Play/Pause button
+        y_offset += 30
+        play_btn = pygame.Rect(panel_x + 10, y_offset, 70, 25)
+        if play_btn.collidepoint(mx, my):
+            is_playing = not is_playing
+
+def update_animation():
+    global current_frame_index, last_frame_time
+    if not is_playing or not animations or current_animation_index >= len(animations):
+        return
+    
+    anim = animations[current_animation_index]
+    current_time = time.time()
+    
+    if current_time - last_frame_time >= anim.frame_wait:
+        save_current_frame()
+        current_frame_index = (current_frame_index + 1) % anim.frame_count
+        load_current_frame()
+        last_frame_time = current_time
+
+# --- Load Projects ---
+# The persisted index fills the sidebar immediately; the rescan runs on a background thread
+project_index = ProjectIndex()
+project_folders = project_index.projects
+project_index.scan_in_background()
+animation_cache = AnimationCache()
+project_loader = ProjectLoader(animation_cache, PROJECT_CACHE_BUDGET)
+
+# --- Main Loop ---
+running = True
+while running:
+    frame_start = time.perf_counter()
+    screen.fill((20, 20, 20))
+    
+    refresh_projects()
+    poll_project_load()
+    
+    # Update animation playback
+    with profiler.phase("update_animation"):
+        update_animation()
+    
+    with profiler.phase("draw_sidebar"):
+        draw_sidebar()
+    with profiler.phase("draw_canvas"):
+        draw_canvas()
+    with profiler.phase("draw_palette"):
+        draw_palette()
+    with profiler.phase("draw_animation_panel"):
+        draw_animation_panel()
+    draw_loading()
+    draw_profiler_hud()
+
+    events_start = time.perf_counter()
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            mx, my = pygame.mouse.get_pos()
+            
+            if mx < SIDEBAR_WIDTH:
+                handle_sidebar_click(mx, my)
+            elif mx > WINDOW_WIDTH - ANIMATION_PANEL_WIDTH:
+                handle_animation_panel_click(mx, my)
+            elif my > WINDOW_HEIGHT - PALETTE_HEIGHT:
+                if event.button == 1:
+                    palette_idx = (mx - SIDEBAR_WIDTH - 10) // 30
+                    if palette_idx in PALETTE:
+                        current_color = palette_idx
+            else:
+                gx, gy = screen_to_grid(mx, my)
+                if animations and current_animation_index < len(animations):
+                    anim = animations[current_animation_index]
+                    if 0 <= gx < anim.frame_width and 0 <= gy < anim.frame_height and event.button in (1, 3):
+                        color = current_color if event.button == 1 else 0
+                        if tool == "fill":
+                            fill_at(gx, gy, color)
+                            save_current_frame()
+                            save_image()
+                        elif tool == "line":
+                            line_start = line_end = (gx, gy)
+                            line_color = color
+                        else:
+                            drawing = event.button == 1
+                            erasing = event.button == 3
+                            stroke_cell = None
+                            paint_stroke(gx, gy, color)
+                if event.button == 2:
+                    # Pans anywhere, including the full-sheet view
+                    is_panning = True
+                    pan_start = (mx, my)
+                if event.button in (4, 5):
+                    old_zoom = zoom
+                    zoom_factor = 1.1 if event.button == 4 else 1 / 1.1
+                    zoom = max(ZOOM_MIN, min(ZOOM_MAX, zoom * zoom_factor))
+                    rel_x = (mx - offset_x) / old_zoom
+                    rel_y = (my - offset_y) / old_zoom
+                    offset_x = mx - rel_x * zoom
+                    offset_y = my - rel_y * zoom
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button in (1, 3) and line_start is not None:
+                finish_line()
+            elif event.button == 1:
+                if drawing:
+                    history.end_stroke()
+                    save_current_frame()
+                    save_image()
+                drawing = False
+            elif event.button == 3:
+                if erasing:
+                    history.end_stroke()
+                    save_current_frame()
+                    save_image()
+                erasing = False
+            elif event.button == 2:
+                is_panning = False
+
+        elif event.type == pygame.MOUSEMOTION:
+            mx, my = event.pos
+            if (drawing or erasing) and animations and current_animation_index < len(animations):
+                # Cells past the frame edge are clipped, so the stroke still reaches the border
+                gx, gy = screen_to_grid(mx, my)
+                paint_stroke(gx, gy, current_color if drawing else 0)
+            elif line_start is not None:
+                line_end = screen_to_grid(mx, my)
+            elif is_panning:
+                dx = mx - pan_start[0]
+                dy = my - pan_start[1]
+                offset_x += dx
+                offset_y += dy
+                pan_start = (mx, my)
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_z and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                patch = history.undo()
+                if patch:
+                    apply_patch(patch, patch.old)
+                    save_current_frame()
+                    save_image()
+            elif event.key == pygame.K_y and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                patch = history.redo()
+                if patch:
+                    apply_patch(patch, patch.new)
+                    save_current_frame()
+                    save_image()
+            elif event.key == pygame.K_SPACE:
+                is_playing = not is_playing
+            elif event.key == pygame.K_o:
+                onion_skin = not onion_skin
+                for renderer in layer_renderers:
+                    renderer.invalidate()
+            elif event.key == pygame.K_r:
+                onion_reference = not onion_reference
+                for renderer in layer_renderers:
+                    renderer.invalidate()
+            elif event.key == pygame.K_s and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                save_current_frame()
+                save_image(final=True)
+            elif event.key == pygame.K_F3:
+                profiler.enabled = not profiler.enabled
+            elif event.key in (pygame.K_b, pygame.K_u, pygame.K_g):
+                tool = {pygame.K_b: "pencil", pygame.K_u: "line", pygame.K_g: "fill"}[event.key]
+                line_start = None
+            elif event.key == pygame.K_l:
+                if layers:
+                    switch_layer((layer_index + 1) % len(layers))
+            elif event.key == pygame.K_LEFTBRACKET:
+                edit_animation(frame_wait_delta=-FRAME_WAIT_STEP)
+            elif event.key == pygame.K_RIGHTBRACKET:
+                edit_animation(frame_wait_delta=FRAME_WAIT_STEP)
+            elif event.key == pygame.K_MINUS:
+                edit_animation(frame_count_delta=-1)
+            elif event.key == pygame.K_EQUALS:
+                edit_animation(frame_count_delta=1)
+            elif event.key == pygame.K_LEFT:
+                if animations and current_animation_index < len(animations):
+                    anim = animations[current_animation_index]
+                    if current_frame_index > 0:
+                        save_current_frame()
+                        current_frame_index -= 1
+                        load_current_frame()
+                        save_image()
+            elif event.key == pygame.K_RIGHT:
+                if animations and current_animation_index < len(animations):
+                    anim = animations[current_animation_index]
+                    if current_frame_index < anim.frame_count - 1:
+                        save_current_frame()
+                        current_frame_index += 1
+                        load_current_frame()
+                        save_image()
+
+    if profiler.enabled:
+        profiler.record("events", events_start, time.perf_counter())
+
+    with profiler.phase("flip"):
+        pygame.display.flip()
+    if profiler.enabled:
+        profiler.record("frame", frame_start, time.perf_counter())
+    clock.tick(60)
+
+deactivate_project()
+project_loader.shutdown()
+autosaver.close()
+if profiler.write_trace(PROFILE_TRACE_PATH):
+    print(f"Wrote profile trace to {PROFILE_TRACE_PATH}")
+pygame.quit()
 sys.exit()
\ No newline at end of file
@@ -0,0 +1,108 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- Constants ---
+PROFILE_WINDOW = 300           # Samples per phase kept for the HUD percentiles (5 s at 60 fps)
+PROFILE_TRACE_EVENTS = 200000  # Trace events kept for the exit dump; older ones are dropped
+
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_PHASE = NullPhase()
+
+class Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+# --- Profiler ---
+class Profiler:
+    # Times named phases into rolling windows for the HUD and Chrome trace events for the
+    # exit dump. While disabled, phase() hands back a shared no-op context manager.
+    def __init__(self, enabled=False, window=PROFILE_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}  # phase -> deque of milliseconds
+        self.events = deque(maxlen=PROFILE_TRACE_EVENTS)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()  # Loads are timed on worker threads too
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def timed(self, name=None):
+        # Decorator form of phase() for load and save functions
+        def decorate(fn):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Phase(self, label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, end):
+        duration = (end - start) * 1000
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(duration)
+            self.events.append(event)
+
+    def percentiles(self):
+        # [(phase, p50, p99, samples)] in milliseconds, slowest p99 first
+        rows = []
+        with self.lock:
+            windows = [(name, sorted(samples)) for name, samples in self.samples.items() if samples]
+        for name, ordered in windows:
+            n = len(ordered)
+            rows.append((name, ordered[n // 2], ordered[min(n - 1, int(n * 0.99))], n))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def write_trace(self, path):
+        # Chrome trace format: load in chrome://tracing or ui.perfetto.dev
+        with self.lock:
+            events = list(self.events)
+        if not events:
+            return False
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+        return True
+
+# Shared by the editor and the project loader threads
+profiler = Profiler()
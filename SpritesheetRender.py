@@ -0,0 +1,325 @@
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+# --- Constants ---
+GRID_COLOR = (40, 40, 40)
+SCALED_CACHE_PIXELS = 16 * 1024 * 1024  # Budget for scaled surfaces kept across zoom levels and frames
+MAX_SCALED_PIXELS = 2048 * 2048          # Larger views are scaled per draw from the visible region only
+SHEET_KEY = (None, None)                 # Renderer key of the full-sheet view
+TILE_SIZE = 256                          # Sheet pixels per side of a full-sheet tile
+TILE_CACHE_PIXELS = 16 * 1024 * 1024     # Budget for mip and scaled tile surfaces
+MAX_SCALED_TILE_PIXELS = 512 * 512       # Bigger on screen and a tile is scaled per draw from its visible part
+MAX_MIP_LEVEL = 8
+MIP_BUILD_BUDGET = 0.004                 # Seconds per draw spent decoding tiles; the rest show a quick preview
+GRID_MIN_SPACING = 4                     # Screen pixels between grid lines; denser grids keep every 2^n-th line
+
+def rgba_surface(rgb, alpha):
+    h, w = alpha.shape
+    surface = pygame.Surface((w, h), pygame.SRCALPHA, 32)
+    pygame.surfarray.blit_array(surface, rgb.swapaxes(0, 1))
+    pixels = pygame.surfarray.pixels_alpha(surface)
+    pixels[...] = alpha.T
+    del pixels  # Unlocks the surface
+    return surface
+
+def indices_to_surface(indices, palette):
+    # The editor draws every non-zero index opaque and index 0 as empty
+    rgb = np.take(palette[:, :3], indices, axis=0)
+    return rgba_surface(rgb, np.where(indices != 0, 255, 0).astype(np.uint8))
+
+def onion_surface(indices, palette, ghosts):
+    # Ghosts are (indices, alpha) pairs composited under the frame, farthest first.
+    # Premultiplied "over" per ghost, each a whole-array operation.
+    h, w = indices.shape
+    colors = palette[:, :3].astype(np.float32)
+    rgb = np.zeros((h, w, 3), dtype=np.float32)
+    alpha = np.zeros((h, w), dtype=np.float32)
+    for ghost, ghost_alpha in ghosts:
+        gh, gw = min(h, ghost.shape[0]), min(w, ghost.shape[1])
+        ghost = ghost[:gh, :gw]
+        a = np.where(ghost != 0, np.float32(ghost_alpha), np.float32(0))
+        under = rgb[:gh, :gw]
+        under *= (1 - a)[..., None]
+        under += np.take(colors, ghost, axis=0) * a[..., None]
+        alpha[:gh, :gw] = alpha[:gh, :gw] * (1 - a) + a
+
+    opaque = indices != 0
+    rgb[opaque] = np.take(colors, indices[opaque], axis=0)
+    alpha[opaque] = 1
+    np.divide(rgb, alpha[..., None], out=rgb, where=alpha[..., None] > 0)
+    return rgba_surface(rgb.astype(np.uint8), (alpha * 255 + 0.5).astype(np.uint8))
+
+def grid_lines(target, cols, rows, cell, origin, first_col=0, first_row=0):
+    ox, oy = origin
+    width, height = int(cols * cell), int(rows * cell)
+    for x in range(cols + 1):
+        sx = ox + int((first_col + x) * cell) - int(first_col * cell)
+        pygame.draw.line(target, GRID_COLOR, (sx, oy), (sx, oy + height))
+    for y in range(rows + 1):
+        sy = oy + int((first_row + y) * cell) - int(first_row * cell)
+        pygame.draw.line(target, GRID_COLOR, (ox, sy), (ox + width, sy))
+
+def premultiplied_palette(palette):
+    # (r*a, g*a, b*a, a) per index as uint32, index 0 empty, so a mip level is a gather plus adds
+    prem = palette.astype(np.uint32)
+    prem[0] = 0
+    prem[:, :3] *= prem[:, 3:]
+    return prem
+
+def mip_rgba(indices, prem, level):
+    # Box filter down to 1 / 2^level by repeated 2x2 sums; colors are alpha-weighted so
+    # transparent pixels don't darken the edges
+    h, w = indices.shape
+    f = 1 << level
+    ph, pw = -h % f, -w % f
+    if ph or pw:
+        indices = np.pad(indices, ((0, ph), (0, pw)))
+    acc = np.take(prem, indices, axis=0)
+    for _ in range(level):
+        acc = acc[0::2, 0::2] + acc[1::2, 0::2] + acc[0::2, 1::2] + acc[1::2, 1::2]
+    alpha = acc[..., 3]
+    rgb = acc[..., :3] // np.maximum(alpha, 1)[..., None]
+    return rgb.astype(np.uint8), (alpha >> (2 * level)).astype(np.uint8)
+
+class TileRenderer:
+    # Full-sheet view: the sheet is cut into TILE_SIZE tiles, each decoded at the mip level the
+    # zoom needs and cached; a draw touches only the tiles inside the clip rect
+    def __init__(self, pixel_size):
+        self.pixel_size = pixel_size
+        self.indices = None
+        self.palette = None
+        self.prem = None
+        self.deadline = 0.0
+        self.mips = OrderedDict()    # (tx, ty, level) -> Surface
+        self.scaled = OrderedDict()  # (tx, ty, level, zoom) -> Surface as drawn
+        self.cached_pixels = 0
+
+    def invalidate(self):
+        self.mips.clear()
+        self.scaled.clear()
+        self.cached_pixels = 0
+
+    def remember(self, cache, key, surface):
+        cache[key] = surface
+        self.cached_pixels += surface.get_width() * surface.get_height()
+        while self.cached_pixels > TILE_CACHE_PIXELS and len(self.mips) + len(self.scaled) > 1:
+            old = self.scaled if self.scaled else self.mips
+            evicted = old.pop(next(iter(old)))
+            self.cached_pixels -= evicted.get_width() * evicted.get_height()
+        return surface
+
+    def lookup(self, cache, key):
+        surface = cache.get(key)
+        if surface is not None:
+            cache.move_to_end(key)
+        return surface
+
+    def tile(self, tx, ty):
+        return self.indices[ty * TILE_SIZE:(ty + 1) * TILE_SIZE, tx * TILE_SIZE:(tx + 1) * TILE_SIZE]
+
+    def mip(self, tx, ty, level):
+        # None once this draw's decode budget is spent
+        key = (tx, ty, level)
+        surface = self.lookup(self.mips, key)
+        if surface is None:
+            if time.perf_counter() > self.deadline:
+                return None
+            if level == 0:
+                surface = indices_to_surface(self.tile(tx, ty), self.palette)
+            else:
+                surface = rgba_surface(*mip_rgba(self.tile(tx, ty), self.prem, level))
+            self.remember(self.mips, key, surface)
+        return surface
+
+    def draw_preview(self, target, cell, origin, visible):
+        # Nearest-sampled stand-in for the whole view at half screen resolution, drawn under
+        # the tiles while some of them still wait for their mip
+        ox, oy = origin
+        gx0, gy0, gx1, gy1 = visible
+        f = max(1, int(2 / cell))
+        sampled = self.indices[gy0:gy1:f, gx0:gx1:f]
+        sx, sy = ox + int(gx0 * cell), oy + int(gy0 * cell)
+        size = (max(1, ox + int(gx1 * cell) - sx), max(1, oy + int(gy1 * cell) - sy))
+        target.blit(pygame.transform.scale(indices_to_surface(sampled, self.palette), size), (sx, sy))
+
+    def draw(self, target, indices, palette, zoom, offset):
+        if indices is not self.indices or palette is not self.palette:
+            self.invalidate()
+            self.indices, self.palette = indices, palette
+            self.prem = premultiplied_palette(palette)
+        self.deadline = time.perf_counter() + MIP_BUILD_BUDGET
+        h, w = indices.shape
+        cell = self.pixel_size * zoom
+        ox, oy = int(offset[0]), int(offset[1])
+        level = 0 if cell >= 1 else min(MAX_MIP_LEVEL, int(math.log2(1 / cell)))
+
+        clip = target.get_clip()
+        gx0 = max(0, int((clip.left - ox) // cell))
+        gy0 = max(0, int((clip.top - oy) // cell))
+        gx1 = min(w, int(math.ceil((clip.right - ox) / cell)))
+        gy1 = min(h, int(math.ceil((clip.bottom - oy) / cell)))
+        if gx0 >= gx1 or gy0 >= gy1:
+            return
+
+        visible = (gx0, gy0, gx1, gy1)
+        tiles = [(tx, ty, self.mip(tx, ty, level))
+                 for ty in range(gy0 // TILE_SIZE, (gy1 - 1) // TILE_SIZE + 1)
+                 for tx in range(gx0 // TILE_SIZE, (gx1 - 1) // TILE_SIZE + 1)]
+        if any(mip is None for _, _, mip in tiles):
+            self.draw_preview(target, cell, (ox, oy), visible)
+        for tx, ty, mip in tiles:
+            if mip is not None:
+                self.draw_tile(target, tx, ty, mip, level, zoom, cell, (ox, oy), visible)
+        self.draw_grid(target, cell, (ox, oy), (gx0, gy0, gx1, gy1))
+
+    def draw_tile(self, target, tx, ty, mip, level, zoom, cell, origin, visible):
+        ox, oy = origin
+        h, w = self.indices.shape
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        x1, y1 = min(w, x0 + TILE_SIZE), min(h, y0 + TILE_SIZE)
+        sx, sy = ox + int(x0 * cell), oy + int(y0 * cell)
+        size = (max(1, ox + int(x1 * cell) - sx), max(1, oy + int(y1 * cell) - sy))
+
+        if size[0] * size[1] <= MAX_SCALED_TILE_PIXELS:
+            key = (tx, ty, level, zoom)
+            scaled = self.lookup(self.scaled, key)
+            if scaled is None:
+                scaled = mip if mip.get_size() == size else pygame.transform.scale(mip, size)
+                self.remember(self.scaled, key, scaled)
+            target.blit(scaled, (sx, sy))
+            return
+
+        # Zoomed in past the cache: scale only the part of the tile inside the clip rect
+        gx0, gy0, gx1, gy1 = visible
+        vx0, vy0 = max(x0, gx0), max(y0, gy0)
+        vx1, vy1 = min(x1, gx1), min(y1, gy1)
+        if vx0 >= vx1 or vy0 >= vy1:
+            return
+        f = 1 << level
+        part = mip.subsurface(((vx0 - x0) // f, (vy0 - y0) // f,
+                               max(1, (vx1 - vx0) // f), max(1, (vy1 - vy0) // f)))
+        px, py = ox + int(vx0 * cell), oy + int(vy0 * cell)
+        part_size = (max(1, ox + int(vx1 * cell) - px), max(1, oy + int(vy1 * cell) - py))
+        target.blit(pygame.transform.scale(part, part_size), (px, py))
+
+    def draw_grid(self, target, cell, origin, visible):
+        # Every 2^n-th line once cells get closer than GRID_MIN_SPACING, so a zoomed-out
+        # sheet draws a few dozen lines instead of one per pixel column
+        ox, oy = origin
+        gx0, gy0, gx1, gy1 = visible
+        step = 1 if cell >= GRID_MIN_SPACING else 1 << math.ceil(math.log2(GRID_MIN_SPACING / cell))
+        h, w = self.indices.shape
+        top, bottom = oy + int(gy0 * cell), oy + int(gy1 * cell)
+        left, right = ox + int(gx0 * cell), ox + int(gx1 * cell)
+        for x in range(gx0 - gx0 % step, min(w, gx1) + 1, step):
+            sx = ox + int(x * cell)
+            pygame.draw.line(target, GRID_COLOR, (sx, top), (sx, bottom))
+        for y in range(gy0 - gy0 % step, min(h, gy1) + 1, step):
+            sy = oy + int(y * cell)
+            pygame.draw.line(target, GRID_COLOR, (left, sy), (right, sy))
+
+class FrameRenderer:
+    def __init__(self, pixel_size):
+        self.pixel_size = pixel_size
+        self.surfaces = {}             # (animation, frame) -> unscaled Surface
+        self.sources = {}              # (animation, frame) -> keys of the ghost frames blended into it
+        self.scaled = OrderedDict()    # (animation, frame, zoom) -> scaled Surface
+        self.grids = OrderedDict()     # (w, h, zoom) -> grid overlay Surface
+        self.cached_pixels = 0
+        self.tiles = TileRenderer(pixel_size)  # SHEET_KEY is drawn tile by tile
+
+    def invalidate(self, animation=None, frame=None):
+        if animation is None and frame is None:
+            self.surfaces.clear()
+            self.sources.clear()
+            for key in list(self.scaled):
+                self.forget(self.scaled, key)
+            self.tiles.invalidate()
+            return
+
+        # An edited frame also stales every onion skin it shows up in
+        edited = (animation, frame)
+        stale = {edited}
+        stale.update(key for key, sources in self.sources.items() if edited in sources)
+        for key in stale:
+            self.surfaces.pop(key, None)
+            self.sources.pop(key, None)
+        for key in [k for k in self.scaled if k[:2] in stale]:
+            self.forget(self.scaled, key)
+
+    def frame_surface(self, key, indices, palette, ghosts=None):
+        # ghosts is a callable returning (key, indices, alpha) triples; only called on a miss
+        surface = self.surfaces.get(key)
+        if surface is None:
+            ghost_list = ghosts() if ghosts is not None else []
+            if ghost_list:
+                surface = onion_surface(indices, palette, [(g, a) for _, g, a in ghost_list])
+                self.sources[key] = {k for k, _, _ in ghost_list}
+            else:
+                surface = indices_to_surface(indices, palette)
+            self.surfaces[key] = surface
+        return surface
+
+    def remember(self, cache, key, surface):
+        cache[key] = surface
+        self.cached_pixels += surface.get_width() * surface.get_height()
+        while self.cached_pixels > SCALED_CACHE_PIXELS and len(cache) > 1:
+            self.forget(cache, next(iter(cache)))
+        return surface
+
+    def forget(self, cache, key):
+        surface = cache.pop(key)
+        self.cached_pixels -= surface.get_width() * surface.get_height()
+
+    def grid_surface(self, w, h, zoom):
+        key = (w, h, zoom)
+        grid = self.grids.get(key)
+        if grid is not None:
+            self.grids.move_to_end(key)
+            return grid
+        cell = self.pixel_size * zoom
+        grid = pygame.Surface((int(w * cell) + 1, int(h * cell) + 1), pygame.SRCALPHA, 32)
+        grid_lines(grid, w, h, cell, (0, 0))
+        return self.remember(self.grids, key, grid)
+
+    def draw(self, target, key, indices, palette, zoom, offset, ghosts=None):
+        h, w = indices.shape
+        if w == 0 or h == 0:
+            return
+        if key == SHEET_KEY:
+            self.tiles.draw(target, indices, palette, zoom, offset)
+            return
+        cell = self.pixel_size * zoom
+        ox, oy = int(offset[0]), int(offset[1])
+        base = self.frame_surface(key, indices, palette, ghosts)
+
+        sw, sh = max(1, int(w * cell)), max(1, int(h * cell))
+        if sw * sh <= MAX_SCALED_PIXELS:
+            scaled_key = key + (zoom,)
+            scaled = self.scaled.get(scaled_key)
+            if scaled is None:
+                scaled = pygame.transform.scale(base, (sw, sh))
+                self.remember(self.scaled, scaled_key, scaled)
+            else:
+                self.scaled.move_to_end(scaled_key)
+            target.blit(scaled, (ox, oy))
+            target.blit(self.grid_surface(w, h, zoom), (ox, oy))
+            return
+
+        # Too large to cache scaled: only scale the part of the image inside the clip rect
+        clip = target.get_clip()
+        gx0 = max(0, int((clip.left - ox) // cell))
+        gy0 = max(0, int((clip.top - oy) // cell))
+        gx1 = min(w, int(math.ceil((clip.right - ox) / cell)))
+        gy1 = min(h, int(math.ceil((clip.bottom - oy) / cell)))
+        if gx0 >= gx1 or gy0 >= gy1:
+            return
+        visible = base.subsurface((gx0, gy0, gx1 - gx0, gy1 - gy0))
+        sx, sy = ox + int(gx0 * cell), oy + int(gy0 * cell)
+        size = (max(1, int((gx1 - gx0) * cell)), max(1, int((gy1 - gy0) * cell)))
+        target.blit(pygame.transform.scale(visible, size), (sx, sy))
+        grid_lines(target, gx1 - gx0, gy1 - gy0, cell, (sx, sy), gx0, gy0)
@@ -0,0 +1,323 @@
+import re
+
+# --- Tokenizer ---
+# Mirrors the tokenizer in nxml.lua: whitespace, comments, <!...> and <?...?> are skipped
+# anywhere (even inside tags), values may be quoted or bare, and a bare string runs until
+# whitespace or punctuation.
+TOKEN_RE = re.compile(r'''
+    (?:[ \t\r\n]+ | <!--.*?(?:-->|\Z) | <![^>]*>? | <\?.*?(?:\?>|\Z))
+  | (?P<punct>[<>/=])
+  | "(?P<string>[^"]*)"?
+  | (?P<bare>[^ \t\r\n<>/=]+)
+''', re.S | re.X)
+PUNCTUATION = frozenset("<>/=")
+
+class Element:
+    __slots__ = ("name", "attr", "children", "content", "spans", "start", "open_end", "close_start", "end")
+
+    def __init__(self, name, attr=None, children=None):
+        self.name = name
+        self.attr = attr if attr is not None else {}
+        self.children = children if children is not None else []
+        self.content = None
+
+        # Source positions, set by the parser and used by patch(); start is None for new elements
+        self.spans = {}           # attr -> (name start, value start, value end, attribute end)
+        self.start = None         # The '<' of the opening tag
+        self.open_end = None      # The '/' or '>' closing the opening tag
+        self.close_start = None   # The '<' of the closing tag, None when self-closing
+        self.end = None           # Just past the element
+
+    def get(self, attr, default=None):
+        return self.attr.get(attr, default)
+
+    def first_of(self, element_name):
+        for child in self.children:
+            if child.name == element_name:
+                return child
+        return None
+
+    def each_of(self, element_name):
+        return (child for child in self.children if child.name == element_name)
+
+    def all_of(self, element_name):
+        return list(self.each_of(element_name))
+
+    def text(self):
+        if not self.content:
+            return ""
+        text = self.content[0]
+        for prev, elem in zip(self.content, self.content[1:]):
+            if elem in PUNCTUATION or prev in PUNCTUATION:
+                text += elem
+            else:
+                text += " " + elem
+        return text
+
+    def __str__(self):
+        return tostring(self)
+
+class Parser:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.errors = []
+        self.tok_start = 0  # Span of the last token's value
+        self.tok_end = 0
+
+    def report_error(self, type, msg):
+        self.errors.append((type, msg))
+
+    def next_token(self):
+        # Returns (kind, value) where kind is "<", ">", "/", "=" or "string"
+        data, match = self.data, TOKEN_RE.match
+        while self.pos < len(data):
+            m = match(data, self.pos)
+            self.pos = m.end()
+            kind = m.lastgroup
+            if kind is None:
+                continue
+            self.tok_start, self.tok_end = m.span(kind)
+            if kind == "punct":
+                value = m.group(kind)
+                return value, value
+            return "string", m.group(kind)
+        return None
+
+    def cur_char(self):
+        return self.data[self.pos:self.pos + 1]
+
+    def parse_attr(self, elem, name):
+        attr = elem.attr
+        name_start = self.tok_start
+        tok = self.next_token()
+        if tok is None:
+            self.report_error("missing_token", f"parsing attribute '{name}' - did not find a token")
+            return
+        if tok[0] != "=":
+            self.report_error("missing_equals_sign", f"parsing attribute '{name}' - did not find equals sign after attribute name")
+            return
+        tok = self.next_token()
+        if tok is None:
+            self.report_error("missing_token", f"parsing attribute '{name}' - did not find a token")
+        elif tok[0] != "string":
+            self.report_error("missing_attribute_value", f"parsing attribute '{name}' - expected a string after =, but did not find one")
+        elif name in attr:
+            self.report_error("duplicate_attribute", f"parsing attribute '{name}' - attribute already exists")
+        else:
+            attr[name] = tok[1]
+            end = self.tok_end + 1 if self.data[self.tok_end:self.tok_end + 1] == '"' else self.tok_end
+            elem.spans[name] = (name_start, self.tok_start, self.tok_end, end)
+
+    def parse_element(self, skip_opening_tag=False):
+        if not skip_opening_tag:
+            tok = self.next_token()
+            if tok is None:
+                self.report_error("missing_token", "parsing element - did not find a token")
+                return None
+            if tok[0] != "<":
+                self.report_error("missing_tag_open", "couldn't find a '<' to start parsing with")
+        start = self.tok_start
+
+        tok = self.next_token()
+        if tok is None:
+            self.report_error("missing_token", "parsing element - did not find a token")
+            return None
+        if tok[0] != "string":
+            self.report_error("missing_element_name", "expected an element name after '<'")
+            return None
+
+        elem_name = tok[1]
+        elem = Element(elem_name)
+        elem.start = start
+
+        while True:
+            tok = self.next_token()
+            if tok is None:
+                return elem
+            kind = tok[0]
+            if kind == "/":
+                elem.open_end = self.tok_start
+                if self.cur_char() == ">":
+                    self.pos += 1
+                    elem.end = self.pos
+                    return elem
+                break
+            elif kind == ">":
+                elem.open_end = self.tok_start
+                break
+            elif kind == "string":
+                self.parse_attr(elem, tok[1])
+
+        while True:
+            tok = self.next_token()
+            if tok is None:
+                return elem
+            if tok[0] != "<":
+                if elem.content is None:
+                    elem.content = []
+                elem.content.append(tok[1])
+                continue
+
+            if self.cur_char() != "/":
+                child = self.parse_element(True)
+                if child is not None:
+                    elem.children.append(child)
+                continue
+
+            elem.close_start = self.tok_start
+            self.pos += 1
+            end_name = self.next_token()
+            if end_name is None:
+                self.report_error("missing_token", f"parsing element '{elem_name}' - did not find a token")
+                return None
+            if end_name[0] == "string" and end_name[1] == elem_name:
+                close_greater = self.next_token()
+                if close_greater is None:
+                    self.report_error("missing_token", f"parsing element '{elem_name}' - did not find a token")
+                    return None
+                if close_greater[0] != ">":
+                    self.report_error("missing_element_close", f"no closing '>' found for element '{elem_name}'")
+                elem.end = self.tok_end
+            else:
+                self.report_error("mismatched_closing_tag", f"closing element is in wrong order - expected '</{elem_name}>', but instead got '{end_name[1]}'")
+            return elem
+
+    def parse_elements(self):
+        elems = []
+        tok = self.next_token()
+        while tok is not None and tok[0] == "<":
+            elem = self.parse_element(True)
+            if elem is None:
+                self.report_error("missing_element", "parse_element returned nil while parsing elements")
+                return elems
+            elems.append(elem)
+            tok = self.next_token()
+        return elems
+
+# --- API ---
+def parse(data):
+    parser = Parser(data)
+    elem = parser.parse_element(False)
+    for type, msg in parser.errors:
+        print(f"parser error: [{type}] {msg}")
+    return elem
+
+def parse_file(path):
+    with open(path, 'r') as f:
+        return parse(f.read())
+
+def parse_many(data):
+    parser = Parser(data)
+    elems = parser.parse_elements()
+    for type, msg in parser.errors:
+        print(f"parser error: [{type}] {msg}")
+    return elems
+
+def tostring(elem, packed=False, indent_char="\t", cur_indent=""):
+    buffer = ["<", elem.name]
+    for k, v in elem.attr.items():
+        buffer += [" ", k, '="', v, '"']
+
+    if not elem.children and not elem.content:
+        buffer.append(" />")
+        return "".join(buffer)
+
+    buffer.append(">")
+    deeper_indent = cur_indent + indent_char
+    if elem.content:
+        if not packed:
+            buffer += ["\n", deeper_indent]
+        buffer.append(elem.text())
+    if not packed:
+        buffer.append("\n")
+    for child in elem.children:
+        if not packed:
+            buffer.append(deeper_indent)
+        buffer.append(tostring(child, packed, indent_char, deeper_indent))
+        if not packed:
+            buffer.append("\n")
+    buffer += [cur_indent, "</", elem.name, ">"]
+    return "".join(buffer)
+
+# --- Writeback ---
+# patch() rewrites only what changed since `elem` was parsed from `data`: edited attribute
+# values are replaced in place, removed ones are cut, new ones are appended to their tag and
+# new children are serialized after their last parsed sibling. Comments, ordering and
+# indentation survive.
+def quote(value):
+    return str(value).replace('"', "'")
+
+def line_indent(data, pos):
+    line_start = data.rfind("\n", 0, pos) + 1
+    indent = data[line_start:pos]
+    return indent if not indent.strip() else ""
+
+def patch(data, elem):
+    edits = []
+    collect_edits(data, elem, edits)
+    if not edits:
+        return data
+    edits.sort(key=lambda edit: edit[0])
+    pieces, pos = [], 0
+    for start, end, text in edits:
+        pieces += [data[pos:start], text]
+        pos = end
+    pieces.append(data[pos:])
+    return "".join(pieces)
+
+def collect_edits(data, elem, edits):
+    for name, (name_start, value_start, value_end, attr_end) in elem.spans.items():
+        if name not in elem.attr:
+            # Cut the attribute along with the whitespace in front of it
+            cut = name_start
+            while cut > 0 and data[cut - 1] in " \t\r\n":
+                cut -= 1
+            edits.append((cut, attr_end, ""))
+        elif elem.attr[name] != data[value_start:value_end]:
+            if data[value_start - 1:value_start] == '"':
+                edits.append((value_start, value_end, quote(elem.attr[name])))
+            else:
+                edits.append((value_start, value_end, '"' + quote(elem.attr[name]) + '"'))
+
+    added = [name for name in elem.attr if name not in elem.spans]
+    if added:
+        text = "".join(f' {name}="{quote(elem.attr[name])}"' for name in added)
+        kept = [span[3] for name, span in elem.spans.items() if name in elem.attr]
+        anchor = max(kept) if kept else elem.open_end
+        edits.append((anchor, anchor, text))
+
+    new_children = []
+    for child in elem.children:
+        if child.start is None:
+            new_children.append(child)
+        else:
+            collect_edits(data, child, edits)
+    if new_children:
+        insert_children(data, elem, new_children, edits)
+
+def insert_children(data, elem, children, edits):
+    # Each new child goes after the last parsed sibling of the same name, else after the last child
+    parsed = [child for child in elem.children if child.start is not None]
+    indent = line_indent(data, elem.start) if elem.start is not None else ""
+    newline = "\r\n" if "\r\n" in data[:data.find("\n") + 1] else "\n"
+
+    if elem.close_start is None and not parsed:
+        # <Tag ... /> grows into <Tag ...> children </Tag>
+        child_indent = indent + "\t"
+        text = "".join(newline + child_indent + serialize(child, child_indent, newline) for child in children)
+        edits.append((elem.open_end, elem.end, ">" + text + newline + indent + "</" + elem.name + ">"))
+        return
+
+    for child in children:
+        sibling = next((c for c in reversed(parsed) if c.name == child.name), parsed[-1] if parsed else None)
+        if sibling is not None:
+            anchor = sibling.end
+            child_indent = line_indent(data, sibling.start) or indent + "\t"
+        else:
+            anchor = elem.open_end + 1
+            child_indent = indent + "\t"
+        edits.append((anchor, anchor, newline + child_indent + serialize(child, child_indent, newline)))
+
+def serialize(elem, indent, newline):
+    return tostring(elem, False, "\t", indent).replace("\n", newline)
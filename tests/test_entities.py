@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("lupa")
+
+import SpritesheetEntities
+
+ENTITIES = {
+    "one.xml": '<Entity><Base file="mods/m/e/base.xml"/><SpriteComponent image_file="mods/m/one.xml"/></Entity>',
+    # Recovers from the duplicate attribute, so it still counts, with a warning
+    "dup.xml": '<Entity><SpriteComponent image_file="mods/m/dup.xml" a="1" a="2"/></Entity>',
+    "uses_missing.xml": '<Entity><Base file="mods/m/e/missing.xml"/></Entity>',
+    "uses_broken.xml": '<Entity><Base file="mods/m/e/broken.xml"/></Entity>',
+}
+BASES = {
+    "base.xml": '<Entity><SpriteComponent image_file="mods/m/base.xml"/></Entity>',
+    "broken.xml": '</NotAnEntity>',
+}
+
+def write_mod(root):
+    entity_dir = os.path.join(root, "mods", "m", "e")
+    os.makedirs(entity_dir)
+    for name, text in {**ENTITIES, **BASES}.items():
+        with open(os.path.join(entity_dir, name), 'w') as f:
+            f.write(text)
+    return os.path.join(root, "mods", "m")
+
+def test_json_output_is_only_json(tmp_path, capfd):
+    mod_dir = write_mod(str(tmp_path))
+    assert SpritesheetEntities.main(["--json", mod_dir]) == 0
+    out, err = capfd.readouterr()
+
+    # Parser messages from nxml.lua go to stderr, never into the JSON on stdout
+    sprites = json.loads(out)
+    assert sprites == {
+        "mods/m/base.xml": ["mods/m/e/base.xml", "mods/m/e/one.xml"],
+        "mods/m/dup.xml": ["mods/m/e/dup.xml"],
+        "mods/m/one.xml": ["mods/m/e/one.xml"],
+    }
+    assert "duplicate_attribute" in err
+    assert "base file not found: mods/m/e/missing.xml" in err
+    assert "base file failed to parse: mods/m/e/broken.xml" in err
+    assert "not found: mods/m/e/broken.xml" not in err
+
+def test_expander_counts_only_expanded_bases(tmp_path):
+    mod_dir = write_mod(str(tmp_path))
+    files = SpritesheetEntities.ModFiles(mod_dir)
+    expander = SpritesheetEntities.EntityExpander(files)
+    paths = [files.virtual(path) for path in SpritesheetEntities.entity_files(mod_dir)]
+    results = {path: (elem, error) for path, elem, error in expander.expand(paths)}
+
+    assert results["mods/m/e/uses_broken.xml"][0] is None
+    assert results["mods/m/e/dup.xml"][0] is not None and results["mods/m/e/dup.xml"][1]
+    assert expander.base_count == 1
+    assert expander.missing_bases == ["mods/m/e/missing.xml"]
+    assert list(expander.broken_bases) == ["mods/m/e/broken.xml"]
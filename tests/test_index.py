@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from conftest import REPO_ROOT
+from SpritesheetIndex import ProjectIndex
+
+EXAMPLE_DIR = os.path.join(REPO_ROOT, "example")
+# Where example/player.xml says its sheets live: the sprite in 1_ultramarine, the shared
+# hotspot sheet one folder up
+FIRSTBORN_DIR = os.path.join("mods", "Noita40K", "files", "classes", "1_adeptus_astartes", "2_firstborn")
+SPRITE_DIR = os.path.join(FIRSTBORN_DIR, "1_ultramarine")
+
+def example_tree(root):
+    sprite_dir = os.path.join(root, SPRITE_DIR)
+    os.makedirs(sprite_dir)
+    shutil.copy(os.path.join(EXAMPLE_DIR, "player.png"), sprite_dir)
+    shutil.copy(os.path.join(EXAMPLE_DIR, "player.xml"), sprite_dir)
+    hotspots = os.path.join(root, FIRSTBORN_DIR, "_marine_hotspots.png")
+    shutil.copy(os.path.join(EXAMPLE_DIR, "player.png"), hotspots)
+    return sprite_dir, hotspots
+
+def test_hotspots_resolve_relative_to_the_sprite_filename(tmp_path):
+    sprite_dir, hotspots = example_tree(str(tmp_path))
+    projects = ProjectIndex(str(tmp_path)).scan(save=False)
+
+    player = [project for project in projects if project.xml_path]
+    assert len(player) == 1
+    assert player[0].png_path == os.path.join(sprite_dir, "player.png")
+    assert os.path.normpath(player[0].hotspots_path) == os.path.normpath(hotspots)
+
+def test_layer_sheets_are_not_projects(tmp_path):
+    sprite_dir, hotspots = example_tree(str(tmp_path))
+    shutil.copy(os.path.join(EXAMPLE_DIR, "player.png"), os.path.join(sprite_dir, "player_stains.png"))
+    shutil.copy(os.path.join(EXAMPLE_DIR, "player.png"), os.path.join(sprite_dir, "loose.png"))
+    projects = ProjectIndex(str(tmp_path)).scan(save=False)
+
+    pngs = sorted(os.path.basename(project.png_path) for project in projects)
+    assert pngs == ["loose.png", "player.png"]